@@ -7,3 +7,20 @@ class ApiConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """
+        Подключение замера времени SQL запросов.
+
+        И сброса кэша аутентификации по токену.
+        """
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+
+        from .authentication import token_deleted, user_saved
+        from .metrics import install_execute_wrapper
+        connection_created.connect(install_execute_wrapper)
+        post_delete.connect(token_deleted, sender=Token)
+        post_save.connect(user_saved, sender=get_user_model())
@@ -0,0 +1,76 @@
+"""
+Async read path api для запуска под ASGI.
+
+В Django 3.2 нет async ORM, а sync view под ASGI выполняются
+в одном общем потоке процесса. Поэтому горячие маршруты чтения
+оборачиваются в async view, которые выполняют DRF view в отдельном
+пуле потоков: event loop принимает много одновременных запросов,
+а запросы к db идут параллельно в ASYNC_VIEW_THREADS потоках.
+Запросы записи тех же маршрутов выполняются так же, как sync view
+под ASGI: в общем потоке через sync_to_async.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+ASYNC_ROUTES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-feed',
+    'recipes-similar',
+    'recipes-pantry',
+    'recipes-shopping-list',
+    'tags-list',
+    'tags-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'users-subscriptions',
+)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix='async-views')
+
+
+def call_view(view, request, *args, **kwargs):
+    """Выполнение view и рендер ответа в потоке пула."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Async view, выполняющая чтение sync view в пуле потоков."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view, thread_sensitive=True)(
+                request, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, partial(
+            context.run, call_view, view, request, *args, **kwargs))
+    return wrapper
+
+
+def async_urlpatterns(urlpatterns, names=ASYNC_ROUTES):
+    """Замена view маршрутов names на async view."""
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
@@ -0,0 +1,81 @@
+"""Write your api app authentication here."""
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+AUTH_TOKEN_KEY = 'auth_token:{}'
+# Поля пользователя в кэше; пароль и остальные поля не кэшируются
+# и загружаются из db только при обращении к ним.
+AUTH_USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name',
+                    'is_active', 'is_staff', 'is_superuser')
+
+User = get_user_model()
+
+
+def get_token_cache_key(key):
+    """Ключ кэша токена, сам токен в ключ не попадает."""
+    return AUTH_TOKEN_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def load_user(values):
+    """Пользователь из полей кэша, остальные поля отложены."""
+    names = [field.attname for field in User._meta.concrete_fields
+             if field.attname in values]
+    return User.from_db(
+        DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def invalidate_tokens(keys):
+    """
+    Удаление пользователей токенов keys из кэша.
+
+    Ключи удаляются еще раз после фиксации транзакции, чтобы
+    параллельный запрос не вернул в кэш удаленный токен.
+    """
+    cache_keys = [get_token_cache_key(key) for key in keys]
+    cache.delete_many(cache_keys)
+    transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшем пользователя.
+
+    Поля AUTH_USER_FIELDS пользователя токена хранятся в кэше Django
+    AUTH_TOKEN_CACHE_TIMEOUT секунд, поэтому запросы с токеном
+    не обращаются к таблицам токенов и пользователей. Кэш
+    сбрасывается при удалении токена и сохранении пользователя,
+    в том числе при смене пароля и деактивации. Без общего кэша
+    другие процессы принимают удаленный токен до истечения
+    AUTH_TOKEN_CACHE_TIMEOUT секунд.
+    """
+
+    def authenticate_credentials(self, key):
+        """Пользователь токена из кэша или базы данных."""
+        cache_key = get_token_cache_key(key)
+        values = cache.get(cache_key)
+        if values is not None:
+            user = load_user(values)
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key,
+                  {name: getattr(user, name) for name in AUTH_USER_FIELDS},
+                  settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, token
+
+
+def token_deleted(sender, instance, **kwargs):
+    """Сброс кэша удаленного токена."""
+    invalidate_tokens([instance.key])
+
+
+def user_saved(sender, instance, created, **kwargs):
+    """Сброс кэша токенов измененного пользователя."""
+    if not created:
+        invalidate_tokens(Token.objects.filter(
+            user=instance).values_list('key', flat=True))
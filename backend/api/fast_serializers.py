@@ -0,0 +1,135 @@
+"""
+Быстрые списочные сериалайзеры для чтения.
+
+Списки рецептов, тэгов и ингредиентов собираются из строк values()
+в обычные словари без полей DRF на каждый объект. Порядок и значения
+ключей совпадают с представлением обычных сериалайзеров.
+"""
+from collections import defaultdict
+
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+from recipes.images import get_derivative_urls
+from recipes.membership import carts, favorites
+from recipes.models import Recipe, RecipeIngredient
+from users.models import Follow, User
+
+INGREDIENT_COLUMNS = {
+    'id': 'ingredient__id',
+    'name': 'ingredient__name',
+    'measurement_unit': 'ingredient__measurement_unit',
+    'amount': 'amount',
+}
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    Список объектов из строк values().
+
+    Поля дочернего сериалайзера должны быть полями модели
+    без преобразования значений.
+    """
+
+    def to_representation(self, data):
+        """Словари из строк QuerySet с полями дочернего сериалайзера."""
+        if not isinstance(data, QuerySet):
+            return super().to_representation(data)
+        names = list(self.child.fields)
+        return [dict(zip(names, row)) for row in data.values_list(*names)]
+
+
+class RecipeFastListSerializer(serializers.ListSerializer):
+    """
+    Список рецептов для RecipeListSerializer.
+
+    Тэги, ингредиенты, авторы и подписки на авторов загружаются
+    для всей страницы запросами values(), значения полей рецепта
+    берутся из объектов страницы без полей DRF.
+    """
+
+    def load_tags(self, recipe_ids):
+        """Тэги рецептов в порядке сортировки тэгов."""
+        names = list(self.child.fields['tags'].child.fields)
+        tags = defaultdict(list)
+        rows = Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__name').values_list(
+            'recipe_id', *[f'tag__{name}' for name in names])
+        for recipe_id, *values in rows:
+            tags[recipe_id].append(dict(zip(names, values)))
+        return tags
+
+    def load_ingredients(self, recipe_ids):
+        """Ингредиенты рецептов в порядке добавления."""
+        names = list(self.child.fields['ingredients'].child.fields)
+        ingredients = defaultdict(list)
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe_id', *[INGREDIENT_COLUMNS[name] for name in names])
+        for recipe_id, *values in rows:
+            ingredients[recipe_id].append(dict(zip(names, values)))
+        return ingredients
+
+    def load_authors(self, author_ids):
+        """Авторы рецептов с признаком подписки текущего пользователя."""
+        names = list(self.child.fields['author'].fields)
+        columns = [name for name in names if name != 'is_subscribed']
+        user = self.child.context['request'].user
+        subscribed = set()
+        if 'is_subscribed' in names and user.is_authenticated:
+            subscribed = set(Follow.objects.filter(
+                user=user, following_id__in=author_ids
+            ).values_list('following_id', flat=True))
+        authors = {}
+        for row in User.objects.filter(pk__in=author_ids).values(
+                'pk', *columns):
+            row['is_subscribed'] = row['pk'] in subscribed
+            authors[row.pop('pk')] = {name: row[name] for name in names}
+        return authors
+
+    def get_accessors(self, recipes):
+        """Функции получения значений полей рецепта."""
+        child = self.child
+        fields = child.fields
+        recipe_ids = [recipe.pk for recipe in recipes]
+        request = child.context.get('request')
+        accessors = {
+            'id': lambda recipe: recipe.pk,
+            'name': lambda recipe: recipe.name,
+            'text': lambda recipe: recipe.text,
+            'cooking_time': lambda recipe: recipe.cooking_time,
+            'image': lambda recipe: fields['image'].to_representation(
+                recipe.image),
+            'images': lambda recipe: get_derivative_urls(
+                recipe.image_derivatives, request),
+        }
+        if 'tags' in fields:
+            tags = self.load_tags(recipe_ids)
+            accessors['tags'] = lambda recipe: tags.get(recipe.pk, [])
+        if 'ingredients' in fields:
+            ingredients = self.load_ingredients(recipe_ids)
+            accessors['ingredients'] = (
+                lambda recipe: ingredients.get(recipe.pk, []))
+        if 'author' in fields:
+            authors = self.load_authors(
+                {recipe.author_id for recipe in recipes})
+            accessors['author'] = lambda recipe: authors[recipe.author_id]
+        if 'is_favorited' in fields:
+            favorited = child.get_user_recipe_ids(favorites)
+            accessors['is_favorited'] = lambda recipe: recipe.pk in favorited
+        if 'is_in_shopping_cart' in fields:
+            in_cart = child.get_user_recipe_ids(carts)
+            accessors['is_in_shopping_cart'] = (
+                lambda recipe: recipe.pk in in_cart)
+        return [(name, accessors[name]) for name in fields]
+
+    def to_representation(self, data):
+        """Словари рецептов страницы."""
+        recipes = list(data)
+        if not recipes:
+            return []
+        accessors = self.get_accessors(recipes)
+        return [{name: accessor(recipe) for name, accessor in accessors}
+                for recipe in recipes]
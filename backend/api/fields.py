@@ -0,0 +1,17 @@
+"""Write your api app serializer fields here."""
+from rest_framework import serializers
+
+from recipes.images import get_derivative_urls
+
+
+class ImageDerivativesField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки рецепта."""
+
+    def __init__(self, **kwargs):
+        """Источник по умолчанию - Recipe.image_derivatives."""
+        kwargs.setdefault('source', 'image_derivatives')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        """Словарь ссылок по размерам и форматам."""
+        return get_derivative_urls(value, self.context.get('request'))
@@ -1,7 +1,8 @@
 """Write your api app filters here."""
 import django_filters
 from django.contrib.auth import get_user_model
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Cart, Favorite, Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 
 User = get_user_model()
 
@@ -33,23 +34,29 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = django_filters.filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = django_filters.CharFilter(method='get_search')
 
     class Meta:
         """Meta модуль фильтра RecipeFilter."""
 
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
 
     def get_is_favorited(self, queryset, name, value):
         """get метод is_favorited для RecipeViewSet."""
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favorite__user=user)
+            return queryset.in_collection(Favorite, user)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         """get метод is_in_shopping_cart для RecipeViewSet."""
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(recipe_cart__user=user)
+            return queryset.in_collection(Cart, user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск рецептов по релевантности."""
+        return search_recipes(queryset, value)
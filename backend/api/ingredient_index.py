@@ -0,0 +1,68 @@
+"""Write your api app ingredient index here."""
+from bisect import bisect_left
+from threading import Lock
+
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.catalog import INGREDIENTS_CATALOG, get_catalog_version
+from recipes.models import Ingredient
+
+
+class IngredientPrefixIndex:
+    """
+    Индекс ингредиентов для автодополнения в памяти процесса.
+
+    Названия хранятся отсортированными в casefold, поиск по префиксу
+    выполняется бинарным поиском. Индекс строится при первом
+    обращении и перестраивается при смене версии справочника.
+    """
+
+    def __init__(self):
+        """Инициализация пустого индекса."""
+        self._lock = Lock()
+        self._version = None
+        self._entries = ([], [])
+
+    def _build(self, version):
+        """Построение индекса по таблице ингредиентов основной базы."""
+        rows = sorted(
+            Ingredient.objects.using(DEFAULT_DB_ALIAS).values(
+                'id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id']))
+        self._entries = ([row['name'].casefold() for row in rows], rows)
+        self._version = version
+
+    def _ensure_actual(self):
+        """Перестроение индекса при смене версии справочника."""
+        version = get_catalog_version(INGREDIENTS_CATALOG)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+
+    def search(self, query, limit):
+        """
+        Поиск ингредиентов по названию.
+
+        Сначала отдаются совпадения по префиксу, затем по подстроке,
+        не более limit результатов.
+        """
+        self._ensure_actual()
+        keys, rows = self._entries
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while (end < len(keys) and end - start < limit
+               and keys[end].startswith(query)):
+            end += 1
+        result = rows[start:end]
+        if len(result) < limit and query:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,224 @@
+"""Write your benchmark_api command here."""
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, NoReverseMatch, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import urls as api_urls
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+EXTRA_CASES = (
+    ('recipes-list', '?is_favorited=1'),
+    ('recipes-list', '?is_in_shopping_cart=1'),
+    ('recipes-list', '?tags=breakfast&tags=lunch'),
+    ('recipes-list', '?search=суп'),
+    ('recipes-list', '?cursor=&limit=6'),
+    ('recipes-list', '?page=50'),
+    ('recipes-list', '?fields=id,name,image,cooking_time'),
+    ('ingredients-list', '?name=кар'),
+    ('users-subscriptions', '?recipes_limit=3'),
+    ('users-subscriptions', '?omit=recipes'),
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def iter_patterns(patterns):
+    """Обход всех URLPattern с учетом вложенных include."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def allows_get(pattern):
+    """Проверка, что маршрут обрабатывает GET запросы."""
+    callback = pattern.callback
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    view_class = getattr(callback, 'view_class', None)
+    return view_class is not None and hasattr(view_class, 'get')
+
+
+class Command(BaseCommand):
+    """Класс Command для замера задержек эндпоинтов api."""
+
+    help = 'Замер p50/p95/p99 и числа SQL запросов GET эндпоинтов api'
+
+    def add_arguments(self, parser):
+        """Аргументы команды benchmark_api."""
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Количество запросов на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Количество запросов для прогрева')
+        parser.add_argument('--user', help='email пользователя для запросов')
+        parser.add_argument('--base-url',
+                            help='Адрес запущенного сервера, например '
+                                 'http://localhost:8000. По умолчанию '
+                                 'используется тестовый клиент Django')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Количество одновременных запросов, '
+                                 'только вместе с --base-url')
+        parser.add_argument('--output', help='Файл для JSON отчета')
+
+    def get_user(self, email):
+        """Пользователь, от имени которого выполняются запросы."""
+        users = User.objects.filter(is_active=True)
+        if email:
+            users = users.filter(email=email)
+        user = users.annotate(
+            favorites_count=Count('favorite')
+        ).order_by('-favorites_count', 'pk').first()
+        if user is None:
+            raise CommandError('Нет пользователя для запросов')
+        return user
+
+    def get_sample_kwargs(self, user):
+        """Значения параметров маршрутов."""
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        following = user.follower.values_list(
+            'following_id', flat=True).first()
+        return {
+            'recipes': {'pk': recipe and recipe.pk},
+            'tags': {'pk': Tag.objects.values_list('pk', flat=True).first()},
+            'ingredients': {
+                'pk': Ingredient.objects.values_list('pk', flat=True).first()},
+            'users': {'id': following or user.pk},
+            'favorite': {'recipe_id': recipe and recipe.pk},
+            'shoppingcart': {'recipe_id': recipe and recipe.pk},
+            'subscribe': {'user_id': following or user.pk},
+        }
+
+    def get_routes(self, user):
+        """Список (название, путь) всех GET маршрутов api."""
+        samples = self.get_sample_kwargs(user)
+        routes = {}
+        for pattern in iter_patterns(api_urls.urlpatterns):
+            name = pattern.name
+            if not name or not allows_get(pattern):
+                continue
+            keys = set(pattern.pattern.regex.groupindex) - {'format'}
+            kwargs = {key: samples.get(name.split('-')[0], {}).get(key)
+                      for key in keys}
+            if None in kwargs.values():
+                continue
+            try:
+                path = reverse(name, kwargs=kwargs)
+            except NoReverseMatch:
+                continue
+            routes.setdefault(path, name)
+        for name, query in EXTRA_CASES:
+            try:
+                routes.setdefault(reverse(name) + query, name)
+            except NoReverseMatch:
+                continue
+        return [(name, path) for path, name in routes.items()]
+
+    def client_request(self, client, path):
+        """Запрос через тестовый клиент с подсчетом SQL запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries)
+
+    def http_request(self, base_url, token, path):
+        """Запрос к запущенному серверу."""
+        request = Request(base_url.rstrip('/') + quote(path, safe='/?&='),
+                          headers={'Authorization': f'Token {token}'})
+        started = time.perf_counter()
+        try:
+            with urlopen(request) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        return status, time.perf_counter() - started, None
+
+    def measure(self, send, path, requests, pool=None):
+        """Замер requests запросов к path, одновременных при наличии pool."""
+        started = time.perf_counter()
+        results = list((pool.map if pool else map)(send, [path] * requests))
+        wall_time = time.perf_counter() - started
+        timings = [elapsed * 1000 for _, elapsed, _ in results]
+        query_counts = [queries for _, _, queries in results
+                        if queries is not None]
+        return {
+            'statuses': sorted({status for status, _, _ in results}),
+            'requests': len(timings),
+            'throughput_rps': len(timings) / wall_time if wall_time else None,
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'mean_ms': sum(timings) / len(timings) if timings else None,
+            'queries_mean': (sum(query_counts) / len(query_counts)
+                             if query_counts else None),
+            'queries_max': max(query_counts) if query_counts else None,
+        }
+
+    def get_sender(self, user, base_url):
+        """Функция запроса к api от имени user."""
+        token, _ = Token.objects.get_or_create(user=user)
+        if base_url:
+            return partial(self.http_request, base_url, token.key)
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return partial(self.client_request, client)
+
+    def handle(self, *args, **options):
+        """Метод, замеряющий эндпоинты и формирующий JSON отчет."""
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency должен быть больше 0')
+        if concurrency > 1 and not options['base_url']:
+            raise CommandError('--concurrency работает только с --base-url')
+        user = self.get_user(options['user'])
+        send = self.get_sender(user, options['base_url'])
+        pool = None
+        if concurrency > 1:
+            pool = ThreadPoolExecutor(max_workers=concurrency)
+        report = {}
+        for name, path in self.get_routes(user):
+            for _ in range(options['warmup']):
+                send(path)
+            report[path] = {'route': name, 'concurrency': concurrency}
+            report[path].update(
+                self.measure(send, path, options['requests'], pool))
+            if options['verbosity'] > 0:
+                self.stderr.write(
+                    f'{path}: p50={report[path]["p50_ms"]:.2f}ms '
+                    f'rps={report[path]["throughput_rps"]:.1f} '
+                    f'queries={report[path]["queries_max"]}')
+        if pool is not None:
+            pool.shutdown()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,116 @@
+"""Write your benchmark_serializers command here."""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import ORJSONRenderer
+from api.serializers import (IngredientSerializer, RecipeListSerializer,
+                             TagSerializer)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Класс Command для замера скорости сериализации списков."""
+
+    help = ('Замер строк в секунду обычной и быстрой сериализации '
+            'рецептов, тэгов и ингредиентов')
+
+    def add_arguments(self, parser):
+        """Аргументы команды benchmark_serializers."""
+        parser.add_argument('--rows', type=int, default=500,
+                            help='Количество строк в списке')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Количество повторов замера')
+        parser.add_argument('--user', default=None,
+                            help='email пользователя для is_favorited')
+
+    def get_request(self, email):
+        """Запрос списка рецептов от имени пользователя."""
+        users = User.objects.filter(is_active=True)
+        if email:
+            users = users.filter(email=email)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('Нет пользователя для запросов')
+        request = Request(APIRequestFactory(SERVER_NAME='localhost').get(
+            '/api/recipes/'))
+        request.user = user
+        return request
+
+    def get_cases(self, request, rows):
+        """
+        Пары способов сериализации для каждого списка.
+
+        Обычный способ - ListSerializer с полями DRF и JSONRenderer,
+        быстрый - сериалайзеры api и ORJSONRenderer.
+        """
+        context = {'request': request}
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True)[:rows])
+
+        def recipes_default():
+            queryset = Recipe.objects.filter(
+                pk__in=recipe_ids).with_related().with_subscription(
+                    request.user)
+            return serializers.ListSerializer(
+                queryset, child=RecipeListSerializer(),
+                context=context).data
+
+        def recipes_fast():
+            return RecipeListSerializer(
+                Recipe.objects.filter(pk__in=recipe_ids), many=True,
+                context=context).data
+
+        def catalog(model, serializer_class, fast):
+            queryset = model.objects.all()[:rows]
+            if fast:
+                return serializer_class(queryset, many=True).data
+            return serializers.ListSerializer(
+                queryset, child=serializer_class()).data
+
+        return {
+            'recipes': (recipes_default, recipes_fast),
+            'tags': (lambda: catalog(Tag, TagSerializer, False),
+                     lambda: catalog(Tag, TagSerializer, True)),
+            'ingredients': (
+                lambda: catalog(Ingredient, IngredientSerializer, False),
+                lambda: catalog(Ingredient, IngredientSerializer, True)),
+        }
+
+    def measure(self, serialize, renderer, repeat):
+        """Лучшее время сериализации и рендера и результат."""
+        best, content, count = None, None, 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            content = renderer.render(data)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            count = len(data)
+        return best, content, count
+
+    def handle(self, *args, **options):
+        """Метод, сравнивающий обычную и быструю сериализацию."""
+        request = self.get_request(options['user'])
+        report = {}
+        for name, (default, fast) in self.get_cases(
+                request, options['rows']).items():
+            default_time, default_content, count = self.measure(
+                default, JSONRenderer(), options['repeat'])
+            fast_time, fast_content, _ = self.measure(
+                fast, ORJSONRenderer(), options['repeat'])
+            report[name] = {
+                'rows': count,
+                'default_rows_per_second': (
+                    count / default_time if default_time else None),
+                'fast_rows_per_second': (
+                    count / fast_time if fast_time else None),
+                'speedup': default_time / fast_time if fast_time else None,
+                'identical': default_content == fast_content,
+            }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,223 @@
+"""
+Метрики запросов api.
+
+Для каждого запроса собираются число и время SQL запросов,
+время сериализации и общее время. Значения агрегируются
+в гистограммы по view, число и время SQL запросов также
+считаются по базам данных. Метрики отдаются в текстовом
+формате Prometheus.
+Гистограммы хранятся в памяти процесса, поэтому каждый
+воркер отдает только свои значения.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Счетчики одного запроса."""
+
+    __slots__ = ('queries', 'db', 'serializer', 'serializer_depth')
+
+    def __init__(self):
+        """Инициализация счетчиков."""
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializer_depth = 0
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """
+    Обертка SQL запросов для подсчета их числа и времени.
+
+    Счетчики берутся из request_timings, поэтому запросы
+    учитываются в любом потоке, выполняющем код запроса.
+    Число и время запросов также считаются по базам данных.
+    """
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - started
+        alias = context['connection'].alias
+        alias_queries.inc(1, alias)
+        alias_duration.inc(duration, alias)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.db += duration
+            timings.queries += 1
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    """Подключение execute_wrapper к новому соединению с db."""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками."""
+
+    def __init__(self, name, description, buckets, labels):
+        """Инициализация гистограммы."""
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.labels = labels
+        self.values = {}
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        """Добавление значения в гистограмму."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self.values.get(
+                label_values, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.values[label_values] = (counts, total + value)
+
+    def render(self):
+        """Строки гистограммы в текстовом формате Prometheus."""
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            values = [(labels, list(counts), total)
+                      for labels, (counts, total) in self.values.items()]
+        for label_values, counts, total in sorted(values):
+            labels = ','.join(
+                f'{name}="{escape_label(value)}"'
+                for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                       f'{cumulative}')
+            yield f'{self.name}_sum{{{labels}}} {total}'
+            yield f'{self.name}_count{{{labels}}} {cumulative}'
+
+
+class Counter:
+    """Счетчик Prometheus с метками."""
+
+    def __init__(self, name, description, labels):
+        """Инициализация счетчика."""
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self._lock = Lock()
+
+    def inc(self, value, *label_values):
+        """Увеличение счетчика."""
+        with self._lock:
+            self.values[label_values] = (
+                self.values.get(label_values, 0) + value)
+
+    def render(self):
+        """Строки счетчика в текстовом формате Prometheus."""
+        with self._lock:
+            values = sorted(self.values.items())
+        return render_counter(self.name, self.description, [
+            (','.join(f'{name}="{escape_label(value)}"'
+                      for name, value in zip(self.labels, label_values)),
+             total)
+            for label_values, total in values])
+
+
+def escape_label(value):
+    """Экранирование значения метки."""
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+LABELS = ('view', 'method')
+request_duration = Histogram(
+    'foodgram_request_duration_seconds',
+    'Общее время обработки запроса.', DURATION_BUCKETS, LABELS)
+db_duration = Histogram(
+    'foodgram_db_duration_seconds',
+    'Время SQL запросов за запрос.', DURATION_BUCKETS, LABELS)
+db_queries = Histogram(
+    'foodgram_db_queries',
+    'Число SQL запросов за запрос.', QUERY_BUCKETS, LABELS)
+serializer_duration = Histogram(
+    'foodgram_serializer_duration_seconds',
+    'Время сериализации ответа.', DURATION_BUCKETS, LABELS)
+HISTOGRAMS = (request_duration, db_duration, db_queries, serializer_duration)
+alias_queries = Counter(
+    'foodgram_db_alias_queries_total',
+    'Число SQL запросов по базам данных.', ('alias',))
+alias_duration = Counter(
+    'foodgram_db_alias_duration_seconds_total',
+    'Время SQL запросов по базам данных.', ('alias',))
+COUNTERS = (alias_queries, alias_duration)
+
+
+def observe_request(view, method, timings, duration):
+    """Добавление значений запроса в гистограммы."""
+    request_duration.observe(duration, view, method)
+    db_duration.observe(timings.db, view, method)
+    db_queries.observe(timings.queries, view, method)
+    serializer_duration.observe(timings.serializer, view, method)
+
+
+def render_counter(name, description, values):
+    """Строки счетчика в текстовом формате Prometheus."""
+    yield f'# HELP {name} {description}'
+    yield f'# TYPE {name} counter'
+    for labels, value in values:
+        yield f'{name}{{{labels}}} {value}'
+
+
+def render_metrics(membership_caches=()):
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for counter in COUNTERS:
+        lines.extend(counter.render())
+    for name, description, field in (
+        ('foodgram_membership_cache_hits_total',
+         'Попадания в кэш избранного и корзины.', 'hits'),
+        ('foodgram_membership_cache_misses_total',
+         'Промахи кэша избранного и корзины.', 'misses'),
+    ):
+        lines.extend(render_counter(name, description, [
+            (f'cache="{cache.name}"', cache.stats()[field])
+            for cache in membership_caches]))
+    return '\n'.join(lines) + '\n'
+
+
+def timed_serializer(serializer):
+    """
+    Подсчет времени сериализации ответа сериалайзером serializer.
+
+    Оборачивается to_representation только этого экземпляра,
+    поэтому замер не затрагивает другие сериалайзеры процесса.
+    """
+    to_representation = serializer.to_representation
+
+    @wraps(to_representation)
+    def timed_representation(instance):
+        timings = request_timings.get()
+        if timings is None:
+            return to_representation(instance)
+        timings.serializer_depth += 1
+        started = perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            timings.serializer_depth -= 1
+            if not timings.serializer_depth:
+                timings.serializer += perf_counter() - started
+
+    serializer.to_representation = timed_representation
+    return serializer
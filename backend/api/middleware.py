@@ -0,0 +1,84 @@
+"""Write your api app middleware here."""
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestTimings, observe_request, request_timings
+
+
+def get_view_name(view_func, method):
+    """Название view и действия, например RecipeViewSet.list."""
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware для замера времени запросов.
+
+    Считает число и время SQL запросов, время сериализации
+    и общее время, добавляет заголовок Server-Timing
+    и сохраняет значения в гистограммы api.metrics.
+    Работает как в WSGI, так и в ASGI без перехода в sync режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Инициализация middleware."""
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Замер времени обработки запроса."""
+        if self.is_async:
+            return self.__acall__(request)
+        started = perf_counter()
+        timings = RequestTimings()
+        token = self.start(request, timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        """Замер времени обработки запроса в ASGI."""
+        started = perf_counter()
+        timings = RequestTimings()
+        token = self.start(request, timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def start(self, request, timings):
+        """Начало замера запроса."""
+        request.view_name = 'unresolved'
+        return request_timings.set(timings)
+
+    def finish(self, request, response, timings, started):
+        """Сохранение метрик и заголовок Server-Timing."""
+        duration = perf_counter() - started
+        observe_request(request.view_name, request.method, timings, duration)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={timings.db * 1000:.2f};'
+                f'desc="{timings.queries} queries", '
+                f'serializer;dur={timings.serializer * 1000:.2f}, '
+                f'total;dur={duration * 1000:.2f}')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Сохранение названия view для меток метрик."""
+        request.view_name = get_view_name(view_func, request.method)
@@ -0,0 +1,173 @@
+"""Write your api app mixins here."""
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+
+from recipes.catalog import (INGREDIENTS_CATALOG, RECIPES_CATALOG,
+                             TAGS_CATALOG, get_catalog_version)
+from recipes.membership import carts, favorites
+from users.models import Follow
+
+from .metrics import timed_serializer
+from .replicas import read_from_primary
+
+CATALOG_RESPONSE_KEY = 'catalog_response:{}:{}:{}'
+CATALOG_RESPONSE_TIMEOUT = 60 * 60 * 24
+
+
+class SerializerTimingMixin:
+    """Замер времени сериализации ответов view для Server-Timing."""
+
+    def get_serializer(self, *args, **kwargs):
+        """Сериалайзер с замером времени сериализации."""
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+
+class CatalogCacheMixin:
+    """
+    Условные GET запросы и кэширование ответов справочника.
+
+    ETag и Last-Modified вычисляются по версии справочника catalog,
+    при совпадении If-None-Match или If-Modified-Since возвращается
+    304 без обращения к базе данных. Кэшируемый ответ читается
+    из основной базы данных.
+    """
+
+    catalog = None
+
+    def catalog_response(self, handler, request, *args, **kwargs):
+        """Ответ справочника с учетом версии и кэша."""
+        version = get_catalog_version(self.catalog)
+        request_key = md5(
+            f'{request.accepted_renderer.format}:{request.get_full_path()}'
+            .encode()).hexdigest()
+        etag = quote_etag(f'{self.catalog}-{version}-{request_key[:16]}')
+        last_modified = version // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = CATALOG_RESPONSE_KEY.format(
+                self.catalog, version, request_key)
+            data = cache.get(key)
+            if data is None:
+                with read_from_primary():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != HTTP_200_OK:
+                    return response
+                data = (list(response.data)
+                        if isinstance(response.data, list)
+                        else dict(response.data))
+                cache.set(key, data, CATALOG_RESPONSE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Список справочника с условным GET."""
+        return self.catalog_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Элемент справочника с условным GET."""
+        return self.catalog_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class RecipeConditionalMixin:
+    """
+    Условные GET запросы рецептов.
+
+    ETag вычисляется по версиям рецептов ответа, версиям справочников
+    и состоянию избранного, корзины и подписок пользователя, поэтому
+    при совпадении If-None-Match 304 отдается без сериализации.
+    Last-Modified отдается только анонимным пользователям, у которых
+    нет собственного состояния рецептов. При фильтрах по избранному
+    и корзине в ETag входят все рецепты коллекции, так как от них
+    зависят count и next страницы.
+    """
+
+    collection_filters = ('is_favorited', 'is_in_shopping_cart')
+
+    def get_validators(self, request, recipes, catalogs):
+        """ETag и Last-Modified для рецептов recipes."""
+        user = request.user
+        versions = [get_catalog_version(name) for name in catalogs]
+        state = [request.accepted_renderer.format, request.get_full_path(),
+                 versions]
+        favorited = in_cart = subscribed = frozenset()
+        if user.is_authenticated:
+            favorited = favorites.get_ids(user)
+            in_cart = carts.get_ids(user)
+            subscribed = set(Follow.objects.filter(
+                user=user,
+                following_id__in={recipe.author_id for recipe in recipes}
+            ).values_list('following_id', flat=True))
+            state.append(user.pk)
+            for name, recipe_ids in zip(self.collection_filters,
+                                        (favorited, in_cart)):
+                if name in request.query_params:
+                    state.append((name, sorted(recipe_ids)))
+        state.extend(
+            (recipe.pk, recipe.version, recipe.pk in favorited,
+             recipe.pk in in_cart, recipe.author_id in subscribed)
+            for recipe in recipes)
+        etag = quote_etag(md5(repr(state).encode()).hexdigest())
+        last_modified = None
+        if not user.is_authenticated:
+            last_modified = max(
+                [version // 10 ** 9 for version in versions]
+                + [int(recipe.updated_at.timestamp()) for recipe in recipes])
+        return etag, last_modified
+
+    def conditional_response(self, handler, request, recipes, catalogs):
+        """Ответ 304 или ответ handler с заголовками валидаторов."""
+        etag, last_modified = self.get_validators(request, recipes, catalogs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler()
+            if response.status_code != HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов с условным GET."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset) if page is None else page
+
+        def handler():
+            serializer = self.get_serializer(recipes, many=True)
+            if page is None:
+                return Response(serializer.data)
+            return self.get_paginated_response(serializer.data)
+
+        return self.conditional_response(
+            handler, request, recipes,
+            (RECIPES_CATALOG, TAGS_CATALOG, INGREDIENTS_CATALOG))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с условным GET по версии без загрузки связей."""
+        try:
+            recipe = get_object_or_404(
+                self.get_queryset().model.objects.only(
+                    'pk', 'author_id', 'version', 'updated_at'),
+                pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        return self.conditional_response(
+            lambda: super(RecipeConditionalMixin, self).retrieve(
+                request, *args, **kwargs),
+            request, [recipe], (TAGS_CATALOG, INGREDIENTS_CATALOG))
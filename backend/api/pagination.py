@@ -0,0 +1,139 @@
+"""Write your api app pagination here."""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeKeysetPagination(BasePagination):
+    """
+    Keyset пагинация рецептов по (pub_date, id).
+
+    Курсор хранит pub_date и id последнего рецепта страницы,
+    поэтому стоимость запроса не зависит от глубины страницы.
+    Общее количество считается только при count=1.
+    """
+
+    date_field = 'pub_date'
+    id_field = 'pk'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, page_size=None):
+        """Инициализация пагинации."""
+        self.default_page_size = page_size or api_settings.PAGE_SIZE
+
+    def get_page_size(self, request):
+        """Размер страницы из параметра limit."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, obj):
+        """Курсор по pub_date и id рецепта."""
+        pub_date = getattr(obj, self.date_field)
+        position = f'{pub_date.isoformat()}|{getattr(obj, self.id_field)}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Позиция (pub_date, id) из курсора запроса."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = urlsafe_b64decode(cursor.encode()).decode()
+            pub_date, pk = position.split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Страница рецептов после позиции курсора."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == '1':
+            self.count = queryset.count()
+        date_field, id_field = self.date_field, self.id_field
+        queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__lt': pub_date})
+                | Q(**{date_field: pub_date, f'{id_field}__lt': pk}),
+                **{f'{date_field}__lte': pub_date})
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_next_link(self):
+        """Ссылка на следующую страницу."""
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        """Ответ со ссылкой на следующую страницу."""
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['results'] = data
+        return Response(response)
+
+
+class FeedPagination(RecipeKeysetPagination):
+    """Keyset пагинация ленты подписок по (pub_date, recipe_id)."""
+
+    id_field = 'recipe_id'
+
+
+class RecipePagination(PageNumberPagination):
+    """
+    Пагинация рецептов.
+
+    По умолчанию постраничная, при наличии параметра cursor
+    используется RecipeKeysetPagination.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Выбор способа пагинации по параметрам запроса."""
+        self.keyset = None
+        if RecipeKeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = RecipeKeysetPagination(self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Ответ выбранной пагинации."""
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class PantryPagination(PageNumberPagination):
+    """Постраничная пагинация результатов поиска по продуктам."""
+
+    page_size_query_param = 'limit'
+    max_page_size = 100
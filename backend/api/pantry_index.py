@@ -0,0 +1,156 @@
+"""Write your api app pantry index here."""
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from threading import Lock
+
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.catalog import TAGS_CATALOG, get_catalog_version
+from recipes.changes import get_last_change, get_recipe_changes
+from recipes.models import Recipe, RecipeIngredient
+
+
+class PantryIndex:
+    """
+    Обратный индекс ингредиентов рецептов в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    для каждого рецепта — его ингредиенты и тэги. Память индекса
+    пропорциональна числу строк RecipeIngredient, а не наибольшему id.
+    Индекс строится при первом обращении и обновляется по журналу
+    изменений рецептов.
+    """
+
+    def __init__(self):
+        """Инициализация пустого индекса."""
+        self._lock = Lock()
+        self._change = None
+        self._tags_version = None
+        self._recipes = {}
+        self._tags = {}
+        self._postings = {}
+
+    def _add_posting(self, ingredient_id, recipe_id):
+        """Добавление рецепта в массив ингредиента."""
+        postings = self._postings.get(ingredient_id)
+        if postings is None:
+            self._postings[ingredient_id] = array('q', (recipe_id,))
+        else:
+            insort(postings, recipe_id)
+
+    def _remove_posting(self, ingredient_id, recipe_id):
+        """Удаление рецепта из массива ингредиента."""
+        postings = self._postings.get(ingredient_id)
+        if postings is None:
+            return
+        index = bisect_left(postings, recipe_id)
+        if index < len(postings) and postings[index] == recipe_id:
+            del postings[index]
+        if not postings:
+            del self._postings[ingredient_id]
+
+    def _load(self, recipe_ids=None):
+        """
+        Ингредиенты и тэги рецептов recipe_ids или всех рецептов.
+
+        Читаются из основной базы данных, так как номер журнала
+        изменений может опережать реплику.
+        """
+        ingredients = RecipeIngredient.objects.using(
+            DEFAULT_DB_ALIAS).values_list('recipe_id', 'ingredient_id')
+        tags = Recipe.tags.through.objects.using(
+            DEFAULT_DB_ALIAS).values_list('recipe_id', 'tag__slug')
+        if recipe_ids is not None:
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+            tags = tags.filter(recipe_id__in=recipe_ids)
+        recipes = {recipe_id: set() for recipe_id in recipe_ids or ()}
+        recipe_tags = {recipe_id: set() for recipe_id in recipe_ids or ()}
+        for recipe_id, ingredient_id in ingredients.iterator():
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        for recipe_id, slug in tags.iterator():
+            recipe_tags.setdefault(recipe_id, set()).add(slug)
+        return recipes, recipe_tags
+
+    def _build(self, change, tags_version):
+        """
+        Построение индекса по всем рецептам.
+
+        Массив каждого ингредиента создается один раз
+        из отсортированного списка id рецептов.
+        """
+        recipes, recipe_tags = self._load()
+        postings = defaultdict(list)
+        for recipe_id, ingredients in recipes.items():
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(recipe_id)
+        self._postings = {
+            ingredient_id: array('q', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()}
+        self._recipes = {recipe_id: frozenset(ingredients)
+                         for recipe_id, ingredients in recipes.items()}
+        self._tags = {recipe_id: frozenset(slugs)
+                      for recipe_id, slugs in recipe_tags.items()}
+        self._change, self._tags_version = change, tags_version
+
+    def _apply(self, recipes, recipe_tags):
+        """Замена ингредиентов и тэгов рецептов в индексе."""
+        for recipe_id, ingredients in recipes.items():
+            for ingredient_id in self._recipes.pop(recipe_id, ()):
+                self._remove_posting(ingredient_id, recipe_id)
+            if ingredients:
+                self._recipes[recipe_id] = frozenset(ingredients)
+            for ingredient_id in ingredients:
+                self._add_posting(ingredient_id, recipe_id)
+        for recipe_id, slugs in recipe_tags.items():
+            self._tags.pop(recipe_id, None)
+            if slugs:
+                self._tags[recipe_id] = frozenset(slugs)
+
+    def _ensure_actual(self):
+        """Обновление индекса по журналу изменений рецептов."""
+        tags_version = get_catalog_version(TAGS_CATALOG)
+        if (tags_version == self._tags_version
+                and get_last_change() == self._change):
+            return
+        with self._lock:
+            since = self._change
+            if tags_version != self._tags_version:
+                since = None
+            last, changed = get_recipe_changes(since)
+            if changed is None:
+                self._build(last, tags_version)
+            elif last != self._change:
+                self._apply(*self._load(changed))
+                self._change = last
+
+    def search(self, ingredient_ids, max_missing, tags=()):
+        """
+        Рецепты с ингредиентами из ingredient_ids.
+
+        Возвращает кортежи (id рецепта, число имеющихся ингредиентов,
+        число недостающих) для рецептов, которым не хватает не более
+        max_missing ингредиентов, в порядке убывания покрытия.
+        При переданных тэгах остаются рецепты хотя бы с одним из них.
+        """
+        self._ensure_actual()
+        matched = Counter()
+        for ingredient_id in frozenset(ingredient_ids):
+            matched.update(self._postings.get(ingredient_id, ()))
+        tags = frozenset(tags)
+        result = []
+        for recipe_id, count in matched.items():
+            ingredients = self._recipes.get(recipe_id)
+            if ingredients is None:
+                continue
+            missing = len(ingredients) - count
+            if missing > max_missing:
+                continue
+            if tags and tags.isdisjoint(self._tags.get(recipe_id, ())):
+                continue
+            result.append((recipe_id, count, missing))
+        result.sort(key=lambda row: (row[2], -row[1], -row[0]))
+        return result
+
+
+pantry_index = PantryIndex()
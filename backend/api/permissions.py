@@ -1,4 +1,5 @@
 """Write your api app permissions here."""
+from django.conf import settings
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 
@@ -13,3 +14,12 @@ class AuthorPermissionOrReadOnly(BasePermission):
         """
         return (request.method in SAFE_METHODS
                 or obj.author == request.user)
+
+
+class MetricsPermission(BasePermission):
+    """Доступ к метрикам для администратора или с адресов из настроек."""
+
+    def has_permission(self, request, view):
+        """Проверка адреса запроса или прав администратора."""
+        return (request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+                or request.user.is_staff)
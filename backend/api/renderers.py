@@ -0,0 +1,153 @@
+"""Write your api app renderers here."""
+import csv
+import os
+from tempfile import SpooledTemporaryFile
+
+import orjson
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON рендерер на orjson.
+
+    Вывод совпадает с JSONRenderer при компактном JSON без ensure_ascii,
+    в остальных случаях используется JSONRenderer.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Рендер data в JSON."""
+        if (data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        """Метод write псевдо-буфера."""
+        return value
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Базовый рендерер списка покупок."""
+
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Рендер ответов с ошибками в виде текста."""
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode('utf-8')
+
+    def get_content_type(self):
+        """Content-Type ответа с учетом кодировки."""
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, rows):
+        """Генератор частей файла по строкам списка покупок."""
+        raise NotImplementedError('Метод stream должен быть переопределен.')
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Рендерер списка покупок в txt."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        """Генератор строк txt файла."""
+        yield f'{SHOPPING_LIST_TITLE}\n\n'
+        for row in rows:
+            yield (f'{row["name"]} ({row["measurement_unit"]})'
+                   f' — {row["amount"]}\n')
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Рендерер списка покупок в csv."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        """Генератор строк csv файла."""
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['measurement_unit'], row['amount']))
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Рендерер списка покупок в pdf."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def get_font_name(self):
+        """Регистрация шрифта с поддержкой кириллицы."""
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+
+    def stream(self, rows):
+        """
+        Генератор частей pdf файла.
+
+        Документ собирается во временный файл постранично
+        и отдается частями по STREAM_CHUNK_SIZE.
+        """
+        with SpooledTemporaryFile(max_size=STREAM_CHUNK_SIZE) as buffer:
+            font_name = self.get_font_name()
+            width, height = A4
+            line_height = PDF_FONT_SIZE * 1.5
+            pdf = canvas.Canvas(buffer, pagesize=A4)
+            pdf.setFont(font_name, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, SHOPPING_LIST_TITLE)
+            y -= line_height * 2
+            for row in rows:
+                if y < PDF_MARGIN:
+                    pdf.showPage()
+                    pdf.setFont(font_name, PDF_FONT_SIZE)
+                    y = height - PDF_MARGIN
+                pdf.drawString(
+                    PDF_MARGIN, y,
+                    f'{row["name"]} ({row["measurement_unit"]})'
+                    f' — {row["amount"]}')
+                y -= line_height
+            pdf.save()
+            buffer.seek(0)
+            chunk = buffer.read(STREAM_CHUNK_SIZE)
+            while chunk:
+                yield chunk
+                chunk = buffer.read(STREAM_CHUNK_SIZE)
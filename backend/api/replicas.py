@@ -0,0 +1,182 @@
+"""
+Чтение из реплик базы данных.
+
+Запросы SAFE_METHODS читают из одной из реплик DATABASE_REPLICAS,
+остальные запросы и все записи идут в основную базу данных.
+После записи пользователь REPLICA_STICKY_SECONDS секунд читает
+из основной базы данных, чтобы видеть свои изменения до того,
+как они дойдут до реплик. Отметка о записи хранится в подписанной
+cookie, поэтому ее видят все процессы backend, и в общем кэше
+для клиентов без cookie.
+
+Данные для кэшей и индексов, которые живут до смены версии,
+читаются из основной базы данных (read_from_primary), иначе
+отставание реплики сохранилось бы в них до следующего изменения.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_STICKY_KEY = 'replica_sticky:{}'
+REPLICA_STICKY_COOKIE = 'replica_sticky'
+
+replica_state = ContextVar('replica_state', default=None)
+
+
+@contextmanager
+def read_from_primary():
+    """Чтение из основной базы данных внутри блока."""
+    token = replica_state.set(None)
+    try:
+        yield
+    finally:
+        replica_state.reset(token)
+
+
+def stick_to_primary(response, user_id):
+    """Чтение пользователя из основной базы данных после записи."""
+    response.set_signed_cookie(
+        REPLICA_STICKY_COOKIE, user_id, salt=REPLICA_STICKY_COOKIE,
+        max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+        samesite='Lax')
+    cache.set(REPLICA_STICKY_KEY.format(user_id), True,
+              settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(request, user_id):
+    """Проверка, что пользователь недавно выполнял запись."""
+    # Подпись с max_age не дает продлить cookie на клиенте.
+    cookie = request.get_signed_cookie(
+        REPLICA_STICKY_COOKIE, default=None, salt=REPLICA_STICKY_COOKIE,
+        max_age=settings.REPLICA_STICKY_SECONDS)
+    return (cookie == str(user_id)
+            or cache.get(REPLICA_STICKY_KEY.format(user_id), False))
+
+
+class ReplicaState:
+    """
+    База данных для чтения в рамках одного запроса.
+
+    Для запросов чтения база выбирается при первом запросе к db,
+    когда пользователь уже аутентифицирован, и не меняется
+    до конца запроса.
+    """
+
+    __slots__ = ('request', 'alias')
+
+    def __init__(self, request, alias=None):
+        """Инициализация состояния запроса."""
+        self.request = request
+        self.alias = alias
+
+    def get_alias(self):
+        """База данных для чтения."""
+        if self.alias is None:
+            # Запросы аутентификации по сессии выполняются
+            # в основной базе данных.
+            self.alias = DEFAULT_DB_ALIAS
+            user = getattr(self.request, 'user', None)
+            if user is None or not (user.is_authenticated
+                                    and is_sticky(self.request, user.pk)):
+                self.alias = random.choice(settings.DATABASE_REPLICAS)
+        return self.alias
+
+
+class ReplicaRouter:
+    """
+    Роутер чтения из реплик.
+
+    Токены читаются из основной базы данных, так как используются
+    сразу после создания при входе. Внутри транзакции чтение идет
+    из основной базы данных.
+    """
+
+    def db_for_read(self, model, **hints):
+        """База данных для чтения model."""
+        state = replica_state.get()
+        if (state is None or model is Token
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return state.get_alias()
+
+    def db_for_write(self, model, **hints):
+        """Все записи выполняются в основной базе данных."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Связи между объектами основной базы и реплик."""
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Миграции применяются только к основной базе данных."""
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Middleware выбора базы данных для чтения.
+
+    Запросы SAFE_METHODS читают из реплики, если пользователь
+    не выполнял запись последние REPLICA_STICKY_SECONDS секунд,
+    остальные запросы работают с основной базой данных.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Инициализация middleware."""
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Обработка запроса с выбранной базой данных."""
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        self.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        """Обработка запроса с выбранной базой данных в ASGI."""
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_state.reset(token)
+        self.finish(request, response)
+        return response
+
+    def start(self, request):
+        """Состояние запроса для ReplicaRouter."""
+        alias = None if request.method in SAFE_METHODS else DEFAULT_DB_ALIAS
+        return replica_state.set(ReplicaState(request, alias))
+
+    def finish(self, request, response):
+        """Чтение из основной базы данных после записи."""
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and user is not None
+                and user.is_authenticated):
+            stick_to_primary(response, user.pk)
@@ -1,10 +1,19 @@
 """Write your api app serializers here."""
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from recipes.models import (Recipe, Tag, Ingredient, Cart, Favorite,
-                            RecipeIngredient)
+                            RecipeIngredient, ShoppingListItem,
+                            SimilarRecipe)
+from recipes.membership import carts, favorites
+from recipes.search import update_search_index
+from recipes.shopping_list import refresh_recipes
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from users.serializers import UserSerializer
+from .fast_serializers import RecipeFastListSerializer, ValuesListSerializer
+from .fields import ImageDerivativesField
+from .sparse_fields import SparseFieldsMixin, get_sparse_fields
 
 
 User = get_user_model()
@@ -18,6 +27,7 @@ class TagSerializer(serializers.ModelSerializer):
 
         fields = ('id', 'name', 'color', 'slug')
         model = Tag
+        list_serializer_class = ValuesListSerializer
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -28,6 +38,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
         fields = ('id', 'name', 'measurement_unit')
         model = Ingredient
+        list_serializer_class = ValuesListSerializer
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
@@ -59,7 +70,7 @@ class IngredientAddSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериалайзер списочного представления для модели Recipe."""
 
     tags = TagSerializer(many=True, read_only=True)
@@ -70,6 +81,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart')
+    images = ImageDerivativesField()
 
     class Meta:
         """
@@ -80,24 +92,37 @@ class RecipeListSerializer(serializers.ModelSerializer):
 
         model = Recipe
         fields = ('id', 'tags', 'ingredients', 'author',
-                  'name', 'image', 'text', 'cooking_time',
+                  'name', 'image', 'images', 'text', 'cooking_time',
                   'is_favorited', 'is_in_shopping_cart')
+        list_serializer_class = RecipeFastListSerializer
+
+    def to_representation(self, instance):
+        """Передача аннотации подписки на автора в UserSerializer."""
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+    def get_user_recipe_ids(self, membership):
+        """
+        Множество id рецептов пользователя из кэша.
+
+        Множество запрашивается один раз на сериализацию списка.
+        """
+        context_key = f'{membership.name}_ids'
+        if context_key not in self.context:
+            user = self.context.get('request').user
+            self.context[context_key] = (
+                membership.get_ids(user) if user.is_authenticated
+                else frozenset())
+        return self.context[context_key]
 
     def get_is_favorited(self, obj):
         """Метод для получения свойства is_favorited."""
-        return (self.context.get('request').user.is_authenticated
-                and Favorite.objects.filter(
-                    user=self.context.get('request').user,
-                    recipe=obj
-        ).exists())
+        return obj.pk in self.get_user_recipe_ids(favorites)
 
     def get_is_in_shopping_cart(self, obj):
         """Метод для получения свойства is_in_shopping_cart."""
-        return (self.context.get('request').user.is_authenticated
-                and Cart.objects.filter(
-                    user=self.context.get('request').user,
-                    recipe=obj
-        ).exists())
+        return obj.pk in self.get_user_recipe_ids(carts)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -115,31 +140,62 @@ class RecipeSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Метод валидации."""
         ingredients = data.get('ingredients')
-        for ingredient in ingredients:
-            if not Ingredient.objects.filter(
-                    id=ingredient['id']).exists():
-                raise serializers.ValidationError({
-                    'ingredients': f'Ингредиента с id - {ingredient["id"]} нет'
-                })
-        if len(ingredients) != len(set([item['id'] for item in ingredients])):
-            raise serializers.ValidationError(
-                'Ингредиент должен быть уникальным.')
+        if ingredients is not None:
+            ingredient_ids = [item['id'] for item in ingredients]
+            existing_ids = set(Ingredient.objects.filter(
+                id__in=ingredient_ids).values_list('id', flat=True))
+            for ingredient_id in ingredient_ids:
+                if ingredient_id not in existing_ids:
+                    raise serializers.ValidationError({
+                        'ingredients':
+                            f'Ингредиента с id - {ingredient_id} нет'
+                    })
+            if len(ingredient_ids) != len(set(ingredient_ids)):
+                raise serializers.ValidationError(
+                    'Ингредиент должен быть уникальным.')
         tags = data.get('tags')
-        if len(tags) != len(set([item for item in tags])):
+        if tags is not None and len(tags) != len(set(tags)):
             raise serializers.ValidationError({
                 'tags': 'Тэгдолжен быть уникальным.'})
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        """Метод для создания Ингредиентов."""
-        for ingredient in ingredients:
-            RecipeIngredient.objects.bulk_create([
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredient_id=ingredient.get('id'),
-                    amount=ingredient.get('amount'),)
-            ])
+        """Метод для создания Ингредиентов одним запросом."""
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient.get('id'),
+                amount=ingredient.get('amount'),)
+            for ingredient in ingredients
+        ])
+
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Метод для обновления Ингредиентов по разнице.
 
+        Изменяются только добавленные, удаленные
+        и изменившие количество строки RecipeIngredient.
+        """
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        current = {item.ingredient_id: item
+                   for item in RecipeIngredient.objects.filter(recipe=recipe)}
+        removed = [item.pk for ingredient_id, item in current.items()
+                   if ingredient_id not in amounts]
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [item for item in ingredients if item['id'] not in current],
+            recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Переопределение метода create."""
         ingredients = validated_data.pop('ingredients')
@@ -147,28 +203,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        update_search_index([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Переопределение метода update."""
+        """
+        Переопределение метода update.
+
+        Поисковый индекс обновляется при сохранении рецепта,
+        списки покупок с рецептом пересобираются после смены ингредиентов.
+        Флаг similar_stale пишется через update(), так как save()
+        не сохраняет фоновые поля рецепта.
+        """
+        similar_stale = False
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
+            self.update_ingredients(
+                validated_data.pop('ingredients'), instance)
+            refresh_recipes([instance.pk])
+            similar_stale = True
         if 'tags' in validated_data:
             instance.tags.set(validated_data.pop('tags'))
+            similar_stale = True
+        if similar_stale:
+            Recipe.objects.filter(pk=instance.pk).update(similar_stale=True)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        """Переопределение метода to_representation."""
+        """
+        Переопределение метода to_representation.
+
+        Рецепт перечитывается со связанными объектами,
+        чтобы ответ строился без запроса на каждый ингредиент.
+        """
+        request = self.context.get('request')
+        fields = get_sparse_fields(request, RecipeListSerializer)
+        queryset = Recipe.objects.with_related(fields)
+        if fields is None or 'author' in fields:
+            queryset = queryset.with_subscription(request.user)
+        instance = queryset.get(pk=instance.pk)
         return RecipeListSerializer(
             instance,
             context={
-                'request': self.context.get('request')
+                'request': request
             }).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериалайзер для модели Favorite."""
 
     id = serializers.ReadOnlyField(
@@ -184,11 +265,14 @@ class FavoriteSerializer(serializers.ModelSerializer):
     cooking_time = serializers.ReadOnlyField(
         source='recipe.cooking_time',
     )
+    images = ImageDerivativesField(
+        source='recipe.image_derivatives',
+    )
 
     class Meta:
         """Meta настройки сериалайзера для модели Favorite."""
         model = Favorite
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
     def validate(self, data):
         """Валидация сериалайзера."""
@@ -217,11 +301,14 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     cooking_time = serializers.ReadOnlyField(
         source='recipe.cooking_time',
     )
+    images = ImageDerivativesField(
+        source='recipe.image_derivatives',
+    )
 
     class Meta:
         """Meta настройки сериалайзера для модели Cart."""
         model = Cart
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
     def validate(self, data):
         """Валидация сериалайзера."""
@@ -232,3 +319,48 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'Рецепт уже добавлен в корзину.'})
         return data
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериалайзер для модели ShoppingListItem."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        """Meta настройки сериалайзера для модели ShoppingListItem."""
+
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    """Сериалайзер для модели SimilarRecipe."""
+
+    id = serializers.ReadOnlyField(source='similar.id')
+    name = serializers.ReadOnlyField(source='similar.name')
+    image = Base64ImageField(source='similar.image', read_only=True)
+    images = ImageDerivativesField(source='similar.image_derivatives')
+    cooking_time = serializers.ReadOnlyField(source='similar.cooking_time')
+
+    class Meta:
+        """Meta настройки сериалайзера для модели SimilarRecipe."""
+
+        model = SimilarRecipe
+        fields = ('id', 'name', 'image', 'images', 'cooking_time', 'score')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериалайзер списка id рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_RECIPES_LIMIT)
+
+    def validate_recipes(self, value):
+        """Удаление повторов с сохранением порядка."""
+        return list(dict.fromkeys(value))
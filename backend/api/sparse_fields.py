@@ -0,0 +1,43 @@
+"""
+Выборочные поля ответа.
+
+Параметр ?fields= перечисляет поля ответа через запятую,
+параметр ?omit= исключает поля. Представления по тем же полям
+не подгружают связи и колонки, которые в ответ не попадут.
+"""
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(value):
+    """Множество имен полей из строки через запятую."""
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_sparse_fields(request, serializer_class):
+    """
+    Поля serializer_class, запрошенные в параметрах запроса.
+
+    Возвращает None, если ни fields, ни omit не переданы.
+    """
+    if request is None:
+        return None
+    params = request.query_params
+    if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+        return None
+    fields = set(serializer_class.Meta.fields)
+    if FIELDS_PARAM in params:
+        fields &= parse_names(params[FIELDS_PARAM])
+    return fields - parse_names(params.get(OMIT_PARAM, ''))
+
+
+class SparseFieldsMixin:
+    """Сериалайзер с полями из параметров fields и omit запроса."""
+
+    def __init__(self, *args, **kwargs):
+        """Удаление полей, не запрошенных в ответе."""
+        super().__init__(*args, **kwargs)
+        fields = get_sparse_fields(self.context.get('request'), type(self))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
@@ -0,0 +1,812 @@
+"""Тесты api."""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from recipes.batch import user_lock
+from recipes.catalog import INGREDIENTS_CATALOG, get_catalog_version
+from recipes.changes import get_last_change
+from recipes.feed import fan_out_recipe
+from recipes.membership import favorites
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag)
+from recipes.similarity import update_similar_recipes
+from users.models import Follow, User
+
+from . import async_views
+from .async_views import async_urlpatterns
+from .authentication import AUTH_USER_FIELDS, get_token_cache_key
+from .ingredient_index import IngredientPrefixIndex
+from .pagination import RecipePagination
+from .pantry_index import PantryIndex
+from .replicas import (REPLICA_STICKY_COOKIE, ReplicaRouter, ReplicaState,
+                       is_sticky, read_from_primary, replica_state,
+                       stick_to_primary)
+from .urls import router_v1
+
+
+class RecipeListQueriesTest(APITestCase):
+    """Число SQL запросов списка рецептов."""
+
+    LIST_QUERIES = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с тэгами и ингредиентами."""
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            first_name='reader', last_name='reader', password='Passw0rd!')
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        Follow.objects.create(user=cls.user, following=author)
+        tags = [Tag.objects.create(name=f'tag{i}', color=f'#00000{i}',
+                                   slug=f'tag{i}') for i in range(3)]
+        ingredients = [Ingredient.objects.create(
+            name=f'ingredient{i}', measurement_unit='г') for i in range(5)]
+        for i in range(20):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10)
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=i + 1)
+                for ingredient in ingredients)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Клиент с токеном пользователя и пустой кэш."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_list_queries(self, page_size):
+        """
+        Число SQL запросов страницы размера page_size.
+
+        Первый запрос заполняет кэш токена, избранного и корзины.
+        """
+        with mock.patch.object(RecipePagination, 'page_size', page_size):
+            self.client.get('/api/recipes/')
+            with self.assertNumQueries(self.LIST_QUERIES):
+                response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        """Число запросов одинаково для разных размеров страницы."""
+        self.get_list_queries(2)
+        self.get_list_queries(20)
+
+
+class LoadCatalogVersionTest(APITestCase):
+    """Смена версии справочника командой load_catalog."""
+
+    def setUp(self):
+        """Ингредиент справочника и файл с новым ингредиентом."""
+        cache.clear()
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        file = tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8', delete=False)
+        with file:
+            file.write('сахар,г\n')
+        self.path = file.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_load_catalog_changes_web_version(self):
+        """После load_catalog api отдает новую версию справочника."""
+        version = get_catalog_version(INGREDIENTS_CATALOG)
+        response = self.client.get('/api/ingredients/')
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get('/api/ingredients/?name=са').data, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_catalog', INGREDIENTS_CATALOG,
+                         path=self.path, stdout=StringIO())
+        self.assertNotEqual(
+            get_catalog_version(INGREDIENTS_CATALOG), version)
+        response = self.client.get(
+            '/api/ingredients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(
+            [row['name'] for row in
+             self.client.get('/api/ingredients/?name=са').data],
+            ['сахар'])
+
+    def test_version_changes_after_commit(self):
+        """Версия справочника меняется только после коммита."""
+        version = get_catalog_version(INGREDIENTS_CATALOG)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Ingredient.objects.create(name='сахар', measurement_unit='г')
+            self.assertEqual(
+                get_catalog_version(INGREDIENTS_CATALOG), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(
+            get_catalog_version(INGREDIENTS_CATALOG), version)
+
+
+class RecipeWriteQueriesTest(APITestCase):
+    """Число SQL запросов изменения ингредиентов рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор и ингредиенты."""
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'ingredient{i}', measurement_unit='г') for i in range(25)]
+        cls.token = Token.objects.create(user=cls.author)
+
+    def setUp(self):
+        """Клиент с токеном автора, токен и избранное в кэше."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get('/api/recipes/')
+
+    def create_recipe(self, ingredients_count):
+        """Рецепт с ingredients_count ингредиентами."""
+        recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text',
+            image='recipes/image.png', cooking_time=10)
+        recipe.tags.set([self.tag])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[:ingredients_count])
+        return recipe
+
+    def patch_queries(self, ingredients_count):
+        """Число SQL запросов замены ингредиентов рецепта на два."""
+        recipe = self.create_recipe(ingredients_count)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'ingredients': [
+                    {'id': ingredient.pk, 'amount': 2}
+                    for ingredient in self.ingredients[:2]]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['amount'] for row in response.data['ingredients']], [2, 2])
+        return len(queries)
+
+    def test_patch_queries_do_not_depend_on_removed_ingredients(self):
+        """Удаление многих ингредиентов не добавляет запросов."""
+        self.assertEqual(self.patch_queries(3), self.patch_queries(22))
+
+    def test_delete_queries_do_not_depend_on_ingredients(self):
+        """Каскадное удаление ингредиентов выполняется одним запросом."""
+        counts = []
+        for ingredients_count in (3, 22):
+            recipe = self.create_recipe(ingredients_count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+            self.assertEqual(response.status_code, 204)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class MembershipFilterTest(APITestCase):
+    """Фильтр и флаг избранного при устаревшем кэше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Пользователь и рецепт."""
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            first_name='reader', last_name='reader', password='Passw0rd!')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='recipe', text='text',
+            image='recipes/image.png', cooking_time=10)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Клиент с токеном пользователя."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_favorited(self):
+        """id рецептов фильтра is_favorited и их флаги."""
+        response = self.client.get('/api/recipes/?is_favorited=1')
+        return [(row['id'], row['is_favorited'])
+                for row in response.data['results']]
+
+    def test_filter_reads_database(self):
+        """Фильтр не зависит от множества в кэше другого процесса."""
+        self.assertEqual(self.get_favorited(), [])
+        response = self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(cache.get(favorites.get_key(self.user.pk)))
+        self.assertEqual(self.get_favorited(), [(self.recipe.pk, True)])
+        cache.set(favorites.get_key(self.user.pk), frozenset())
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in self.get_favorited()],
+            [self.recipe.pk])
+
+    def test_write_invalidates_cache(self):
+        """Удаление из избранного сбрасывает множество в кэше."""
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(self.get_favorited(), [(self.recipe.pk, True)])
+        response = self.client.delete(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(cache.get(favorites.get_key(self.user.pk)))
+        self.assertEqual(self.get_favorited(), [])
+
+
+class PantryIndexTest(APITestCase):
+    """Индекс поиска по продуктам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с разными наборами ингредиентов."""
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'ingredient{i}', measurement_unit='г') for i in range(4)]
+        cls.recipes = []
+        for i in range(1, 4):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10,
+                image_derivatives={'source': 'recipes/image.png'})
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in cls.ingredients[:i])
+            cls.recipes.append(recipe)
+        cls.recipes[0].tags.set([cls.tag])
+        cls.token = Token.objects.create(user=cls.author)
+
+    def setUp(self):
+        """Пустой кэш и новый индекс."""
+        cache.clear()
+        self.index = PantryIndex()
+
+    def test_search(self):
+        """Покрытие рецептов продуктами и фильтр по тэгам."""
+        pantry = [ingredient.pk for ingredient in self.ingredients[:2]]
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.assertEqual(self.index.search(pantry, 0),
+                         [(second, 2, 0), (first, 1, 0)])
+        self.assertEqual(self.index.search(pantry, 1),
+                         [(second, 2, 0), (first, 1, 0), (third, 2, 1)])
+        self.assertEqual(self.index.search(pantry, 1, ['tag']),
+                         [(first, 1, 0)])
+
+    def test_incremental_update(self):
+        """Изменение ингредиентов рецепта через api попадает в индекс."""
+        pantry = [self.ingredients[3].pk]
+        self.assertEqual(self.index.search(pantry, 3), [])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {'ingredients': [{'id': self.ingredients[3].pk,
+                                  'amount': 1}]},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.index.search(pantry, 0), [(recipe.pk, 1, 0)])
+        self.assertNotIn(
+            recipe.pk,
+            [row[0] for row in self.index.search(
+                [self.ingredients[0].pk], 3)])
+
+
+class BatchCartTest(APITestCase):
+    """Пакетное добавление и удаление рецептов корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с общим ингредиентом."""
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@foodgram.ru',
+            first_name='buyer', last_name='buyer', password='Passw0rd!')
+        cls.ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='г')
+        cls.recipes = []
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10,
+                image_derivatives={'source': 'recipes/image.png'})
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=i + 1)
+            cls.recipes.append(recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Клиент с токеном пользователя."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_totals(self):
+        """Счетчики корзины и избранного рецептов и список покупок."""
+        return (
+            list(Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in self.recipes]).order_by(
+                    'pk').values_list('carts_count', 'favorites_count')),
+            list(ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient_id', 'amount')))
+
+    def test_batch_add_after_single_add(self):
+        """Пакет не учитывает второй раз рецепты, добавленные по одному."""
+        ids = [recipe.pk for recipe in self.recipes]
+        with mock.patch('api.views.user_lock', wraps=user_lock) as lock:
+            self.client.post(f'/api/recipes/{ids[0]}/shopping_cart/')
+            self.client.post(f'/api/recipes/{ids[0]}/favorite/')
+        self.assertEqual(
+            lock.call_args_list, [mock.call(self.user.pk)] * 2)
+        for path in ('shopping_cart', 'favorite'):
+            response = self.client.post(
+                f'/api/recipes/{path}/', {'recipes': ids}, format='json')
+            self.assertEqual(
+                [row['status'] for row in response.data['results']],
+                ['exists', 'added', 'added'])
+        self.assertEqual(
+            self.get_totals(),
+            ([(1, 1), (1, 1), (1, 1)], [(self.ingredient.pk, 6)]))
+        self.client.delete(f'/api/recipes/{ids[1]}/shopping_cart/')
+        self.client.delete(f'/api/recipes/{ids[1]}/favorite/')
+        self.assertEqual(
+            self.get_totals(),
+            ([(1, 1), (0, 0), (1, 1)], [(self.ingredient.pk, 4)]))
+
+    def test_batch_remove_keeps_totals(self):
+        """Счетчики, список покупок и флаги после пакетного удаления."""
+        ids = [recipe.pk for recipe in self.recipes]
+        self.client.post('/api/recipes/shopping_cart/', {'recipes': ids},
+                         format='json')
+        response = self.client.delete(
+            '/api/recipes/shopping_cart/', {'recipes': ids[:2]},
+            format='json')
+        self.assertEqual(
+            [row['status'] for row in response.data['results']],
+            ['removed', 'removed'])
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=ids).order_by('pk').values_list(
+                'carts_count', flat=True)),
+            [0, 0, 1])
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient_id', 'amount')),
+            [(self.ingredient.pk, 3)])
+        response = self.client.get('/api/recipes/?is_in_shopping_cart=1')
+        self.assertEqual(
+            [(row['id'], row['is_in_shopping_cart'])
+             for row in response.data['results']],
+            [(ids[2], True)])
+
+
+class TokenLogoutTest(APITestCase):
+    """Удаленный токен не принимается из кэша."""
+
+    def test_logout_revokes_cached_token(self):
+        """После выхода запрос с тем же токеном получает 401."""
+        user = User.objects.create_user(
+            username='guest', email='guest@foodgram.ru',
+            first_name='guest', last_name='guest', password='Passw0rd!')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class CachedTokenTest(APITestCase):
+    """Кэш пользователей токенов."""
+
+    def setUp(self):
+        """Пользователь с токеном и пустой кэш."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='guest', email='guest@foodgram.ru',
+            first_name='guest', last_name='guest', password='Passw0rd!')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cache_has_no_password(self):
+        """В кэше только поля AUTH_USER_FIELDS без хеша пароля."""
+        self.client.get('/api/users/me/')
+        values = cache.get(get_token_cache_key(self.token.key))
+        self.assertEqual(set(values), set(AUTH_USER_FIELDS))
+        self.assertNotIn(self.user.password, values.values())
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], 'guest@foodgram.ru')
+
+    def test_cached_user_changes_password(self):
+        """Пользователь из кэша меняет пароль без потери полей."""
+        self.client.get('/api/users/me/')
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'Passw0rd!',
+            'new_password': 'NewPassw0rd!'})
+        self.assertEqual(response.status_code, 204)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password('NewPassw0rd!'))
+        self.assertEqual(user.email, 'guest@foodgram.ru')
+
+
+class RecipeConditionalTest(APITestCase):
+    """Условные GET запросы рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Пользователь с тремя рецептами в избранном."""
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            first_name='reader', last_name='reader', password='Passw0rd!')
+        cls.recipes = [Recipe.objects.create(
+            author=cls.user, name=f'recipe{i}', text='text',
+            image='recipes/image.png', cooking_time=10,
+            image_derivatives={'source': 'recipes/image.png'})
+            for i in range(3)]
+        for recipe in cls.recipes:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Клиент с токеном пользователя и пустой кэш."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_removed_favorite_on_other_page_changes_etag(self):
+        """Удаление рецепта другой страницы меняет count и ETag."""
+        with mock.patch.object(RecipePagination, 'page_size', 2):
+            response = self.client.get('/api/recipes/?is_favorited=1')
+            self.assertEqual(response.data['count'], 3)
+            page_ids = {row['id'] for row in response.data['results']}
+            other = next(recipe for recipe in self.recipes
+                         if recipe.pk not in page_ids)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f'/api/recipes/{other.pk}/favorite/')
+            response = self.client.get(
+                '/api/recipes/?is_favorited=1',
+                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_retrieve_invalid_id(self):
+        """Нечисловой id рецепта дает 404."""
+        self.assertEqual(
+            self.client.get('/api/recipes/abc/').status_code, 404)
+
+
+class SimilarRecipesEndpointTest(APITestCase):
+    """Эндпоинт похожих рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Два рецепта с общим ингредиентом и посчитанные списки."""
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='г')
+        derivatives = {'source': 'recipes/image.png', 'sizes': {
+            'small': {'webp': 'recipes/derivatives/image_small.webp'}}}
+        cls.recipes = []
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10,
+                image_derivatives=derivatives)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+            cls.recipes.append(recipe)
+        update_similar_recipes(full=True)
+
+    def test_similar_returns_absolute_urls(self):
+        """Ссылки на картинки похожих рецептов абсолютные."""
+        first, second = self.recipes
+        response = self.client.get(f'/api/recipes/{first.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data,
+            [{'id': second.pk, 'name': 'recipe1',
+              'image': 'http://testserver/media/recipes/image.png',
+              'images': {'small': {'webp': 'http://testserver/media/'
+                                           'recipes/derivatives/'
+                                           'image_small.webp'}},
+              'cooking_time': 10, 'score': 1.0}])
+
+    def test_similar_invalid_id(self):
+        """Нечисловой и несуществующий id рецепта дают 404."""
+        self.assertEqual(
+            self.client.get('/api/recipes/abc/similar/').status_code, 404)
+        self.assertEqual(
+            self.client.get('/api/recipes/0/similar/').status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    """Выбор базы данных для чтения и привязка к основной базе."""
+
+    def setUp(self):
+        """Роутер, фабрика запросов и пустой кэш."""
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_alias(self, request, model=Recipe):
+        """База данных чтения model в рамках запроса request."""
+        token = replica_state.set(ReplicaState(request))
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            replica_state.reset(token)
+
+    def get_request(self, user, cookies=None):
+        """GET запрос пользователя user с cookies."""
+        request = self.factory.get('/api/recipes/')
+        request.COOKIES.update(cookies or {})
+        request.user = user
+        return request
+
+    def test_reads_go_to_replica(self):
+        """Чтение запроса идет в реплику, вне запроса - в основную базу."""
+        self.assertEqual(
+            self.read_alias(self.get_request(AnonymousUser())), 'replica1')
+        self.assertEqual(self.router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_token_and_atomic_read_primary(self):
+        """Токены и чтение внутри транзакции идут в основную базу."""
+        request = self.get_request(AnonymousUser())
+        self.assertEqual(self.read_alias(request, Token), DEFAULT_DB_ALIAS)
+        with mock.patch.object(
+                connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.read_alias(request), DEFAULT_DB_ALIAS)
+
+    def test_read_from_primary(self):
+        """Чтение для кэшей и индексов идет в основную базу."""
+        token = replica_state.set(
+            ReplicaState(self.get_request(AnonymousUser())))
+        try:
+            with read_from_primary():
+                self.assertEqual(
+                    self.router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica1')
+        finally:
+            replica_state.reset(token)
+
+    def test_sticky_cookie(self):
+        """Подписанная cookie привязывает к основной базе любой процесс."""
+        user, other = User(pk=1), User(pk=2)
+        response = HttpResponse()
+        stick_to_primary(response, user.pk)
+        cache.clear()
+        cookies = {REPLICA_STICKY_COOKIE:
+                   response.cookies[REPLICA_STICKY_COOKIE].value}
+        self.assertEqual(response.cookies[REPLICA_STICKY_COOKIE]['max-age'],
+                         5)
+        self.assertEqual(
+            self.read_alias(self.get_request(user, cookies)),
+            DEFAULT_DB_ALIAS)
+        self.assertEqual(
+            self.read_alias(self.get_request(other, cookies)), 'replica1')
+        forged = {REPLICA_STICKY_COOKIE: str(user.pk)}
+        self.assertFalse(is_sticky(self.get_request(user, forged), user.pk))
+
+    def test_sticky_cache(self):
+        """Без cookie отметка о записи берется из общего кэша."""
+        user, other = User(pk=1), User(pk=2)
+        stick_to_primary(HttpResponse(), user.pk)
+        self.assertEqual(
+            self.read_alias(self.get_request(user)), DEFAULT_DB_ALIAS)
+        self.assertEqual(
+            self.read_alias(self.get_request(other)), 'replica1')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class PrimaryCacheLoadTest(APITestCase):
+    """Кэши и индексы загружаются из основной базы данных."""
+
+    def test_cache_loaders_skip_replica(self):
+        """Загрузка не обращается к реплике, даже если она выбрана."""
+        user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            first_name='reader', last_name='reader', password='Passw0rd!')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        cache.clear()
+        token = replica_state.set(
+            ReplicaState(RequestFactory().get('/'), 'replica1'))
+        try:
+            with mock.patch.object(
+                    connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False):
+                self.assertEqual(favorites.get_ids(user), frozenset())
+                self.assertEqual(
+                    [row['name'] for row in
+                     IngredientPrefixIndex().search('со', 10)],
+                    ['соль'])
+                self.assertEqual(PantryIndex().search([1], 0), [])
+        finally:
+            replica_state.reset(token)
+
+
+class AsyncRouteWriteTest(APITestCase):
+    """Запись через маршрут async view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепт автора с одним ингредиентом."""
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'ingredient{i}', measurement_unit='г') for i in range(2)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text',
+            image='recipes/image.png', cooking_time=10,
+            image_derivatives={'source': 'recipes/image.png'})
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredients[0], amount=1)
+        cls.token = Token.objects.create(user=cls.author)
+
+    def test_write_runs_sync_and_commits(self):
+        """PATCH идет мимо пула потоков, коммитится и обновляет кэши."""
+        cache.clear()
+        view = next(
+            pattern.callback for pattern in async_urlpatterns(router_v1.urls)
+            if pattern.name == 'recipes-detail')
+        request = APIRequestFactory().patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {'ingredients': [{'id': self.ingredients[1].pk, 'amount': 3}]},
+            format='json', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        change = get_last_change()
+        with mock.patch.object(async_views.executor, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = async_to_sync(view)(
+                    request, pk=str(self.recipe.pk))
+        self.assertEqual(response.status_code, 200)
+        submit.assert_not_called()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).version,
+            self.recipe.version + 1)
+        self.assertGreater(get_last_change(), change)
+        self.assertEqual(
+            [recipe_id for recipe_id, matched, missing in
+             PantryIndex().search([self.ingredients[1].pk], 0)],
+            [self.recipe.pk])
+
+
+class FeedPaginationTest(APITestCase):
+    """Keyset пагинация ленты подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Подписчик с пятью рецептами автора в ленте."""
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            first_name='reader', last_name='reader', password='Passw0rd!')
+        Follow.objects.create(user=cls.user, following=author)
+        cls.recipes = []
+        with mock.patch('recipes.signals.schedule_fan_out'):
+            for i in range(5):
+                cls.recipes.append(Recipe.objects.create(
+                    author=author, name=f'recipe{i}', text='text',
+                    image='recipes/image.png', cooking_time=10,
+                    image_derivatives={'source': 'recipes/image.png'}))
+        for recipe in cls.recipes:
+            fan_out_recipe(recipe.pk, recipe.author_id, recipe.pub_date)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def test_feed_pages(self):
+        """Страницы ленты по курсору без пропусков и повторов."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        ids, url = [], '/api/recipes/feed/?limit=2&count=1'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 5)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            ids, [recipe.pk for recipe in reversed(self.recipes)])
+
+
+class ShoppingListExportTest(APITestCase):
+    """Выгрузка списка покупок в txt, csv и pdf."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Корзина из двух рецептов с общим ингредиентом."""
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@foodgram.ru',
+            first_name='buyer', last_name='buyer', password='Passw0rd!')
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipes = []
+        for i, amounts in enumerate(({flour: 100, salt: 5}, {flour: 200})):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10,
+                image_derivatives={'source': 'recipes/image.png'})
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=amount)
+                for ingredient, amount in amounts.items())
+            cls.recipes.append(recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Клиент с токеном пользователя."""
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def download(self, query='', **extra):
+        """Ответ и содержимое файла списка покупок."""
+        for recipe in self.recipes:
+            self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/{query}', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt(self):
+        """По умолчанию txt с суммами ингредиентов по алфавиту."""
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=shopping_list.txt')
+        self.assertEqual(
+            content.decode(),
+            'Список покупок:\n\nмука (г) — 300\nсоль (г) — 5\n')
+
+    def test_csv(self):
+        """csv по параметру format с заголовком и суммами."""
+        response, content = self.download('?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            content.decode(),
+            'name,measurement_unit,amount\r\nмука,г,300\r\nсоль,г,5\r\n')
+
+    def test_pdf(self):
+        """pdf по параметру format."""
+        response, content = self.download('?format=pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=shopping_list.pdf')
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+
+    def test_accept_header(self):
+        """Формат выбирается и по заголовку Accept."""
+        response, content = self.download(HTTP_ACCEPT='text/csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertTrue(content.startswith(b'name,measurement_unit,amount'))
+
+    def test_empty_cart_and_unknown_format(self):
+        """Пустая корзина дает 400, неизвестный формат - 404."""
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode(), 'В корзине нет товаров')
+        self.client.post(f'/api/recipes/{self.recipes[0].pk}/shopping_cart/')
+        self.assertEqual(self.client.get(
+            '/api/recipes/download_shopping_cart/?format=xml').status_code,
+            404)
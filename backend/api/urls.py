@@ -1,11 +1,13 @@
 """Set your api URLs here."""
 
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 from users.views import UserViewSet, FollowViewSet
 from .views import (RecipeViewSet, TagViewSet,
                     IngredientViewSet, FavoriteViewSet,
-                    ShoppingCartViewSet)
+                    ShoppingCartViewSet, CacheStatsView, MetricsView)
+from .async_views import async_urlpatterns
 
 router_v1 = DefaultRouter()
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
@@ -25,9 +27,14 @@ router_v1.register(
     FollowViewSet,
     basename='subscribe')
 
+router_urls = router_v1.urls
+if settings.ASYNC_VIEWS:
+    router_urls = async_urlpatterns(router_urls)
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('cache_stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
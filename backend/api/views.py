@@ -1,51 +1,100 @@
 """Set your api Views here."""
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from recipes.models import (Recipe, Tag, Ingredient, Cart, Favorite)
+from rest_framework.views import APIView
+from recipes.batch import bulk_add, bulk_remove, user_lock
+from recipes.catalog import INGREDIENTS_CATALOG, TAGS_CATALOG
+from recipes.membership import carts, favorites
+from recipes.models import (Recipe, Tag, Ingredient, Cart, Favorite,
+                            FeedEntry, ShoppingListItem, SimilarRecipe)
 from .serializers import (TagSerializer, RecipeSerializer,
                           IngredientSerializer, RecipeListSerializer,
-                          FavoriteSerializer, ShoppingCartSerializer)
+                          FavoriteSerializer, ShoppingCartSerializer,
+                          ShoppingListItemSerializer,
+                          SimilarRecipeSerializer, RecipeIdsSerializer)
 from .filters import IngredientFilter, RecipeFilter
-from .permissions import AuthorPermissionOrReadOnly
+from .ingredient_index import ingredient_index
+from .pantry_index import pantry_index
+from .sparse_fields import get_sparse_fields
+from .metrics import render_metrics, timed_serializer
+from .mixins import (CatalogCacheMixin, RecipeConditionalMixin,
+                     SerializerTimingMixin)
+from .pagination import FeedPagination, PantryPagination, RecipePagination
+from .permissions import AuthorPermissionOrReadOnly, MetricsPermission
+from .renderers import (ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                        ShoppingListPDFRenderer)
 from django.contrib.auth import get_user_model
 from rest_framework import mixins, viewsets
 from rest_framework.status import (HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
-from rest_framework.permissions import (AllowAny,
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly,
                                         SAFE_METHODS)
 User = get_user_model()
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+FAST_LIST_ACTIONS = ('list', 'feed', 'pantry')
 
-class CreateDestroyViewSet(mixins.CreateModelMixin,
+
+class CreateDestroyViewSet(SerializerTimingMixin,
+                           mixins.CreateModelMixin,
                            mixins.DestroyModelMixin,
                            viewsets.GenericViewSet):
     """Mixin CreateDestroy."""
     pass
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RecipeConditionalMixin, SerializerTimingMixin,
+                    viewsets.ModelViewSet):
     """Viewset для модели Recipe и сериалайзеров."""
 
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,
                           AuthorPermissionOrReadOnly)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
 
     def get_queryset(self):
-        """Переопределение метода qet_queryset."""
-        is_favorited = self.request.query_params.get('is_favorited')
-        if is_favorited is not None and int(is_favorited) == 1:
-            return Recipe.objects.filter(
-                favorite_recipe__user=self.request.user)
-        is_in_shopping_cart = self.request.query_params.get(
-            'is_in_shopping_cart')
-        if is_in_shopping_cart is not None and int(is_in_shopping_cart) == 1:
-            return Recipe.objects.filter(cart_recipe__user=self.request.user)
-        return Recipe.objects.all()
+        """
+        Переопределение метода qet_queryset.
+
+        Для чтения подгружаются только связи полей из ?fields= и ?omit=.
+        Списки сериализуются RecipeFastListSerializer, который сам
+        загружает связи страницы, поэтому для них связи не подгружаются.
+        """
+        user = self.request.user
+        fields = None
+        if self.request.method in SAFE_METHODS:
+            fields = get_sparse_fields(self.request, RecipeListSerializer)
+        if self.action in FAST_LIST_ACTIONS:
+            queryset = Recipe.objects.with_columns(fields)
+        else:
+            queryset = Recipe.objects.with_related(fields)
+            if fields is None or 'author' in fields:
+                queryset = queryset.with_subscription(user)
+        if self.request.query_params.get('is_favorited') == '1':
+            return self.filter_membership(queryset, favorites)
+        if self.request.query_params.get('is_in_shopping_cart') == '1':
+            return self.filter_membership(queryset, carts)
+        return queryset
+
+    def filter_membership(self, queryset, membership):
+        """
+        Рецепты из избранного или корзины пользователя.
+
+        Фильтр выполняется в db, кэш membership используется
+        только для флагов рецептов.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.in_collection(membership.model, user)
 
     def get_serializer_class(self):
         """Выбор сериалайзера в зависимости от типа запроса."""
@@ -57,45 +106,187 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Переопределение метода perform_create."""
         serializer.save(author=self.request.user)
 
+    @action(detail=False, methods=('get',),
+            pagination_class=FeedPagination,
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """
+        Метод для получения ленты подписок.
+
+        Страница ленты читается из FeedEntry по индексу
+        (user, pub_date, recipe), затем рецепты загружаются по id.
+        """
+        entries = self.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user))
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries])
+        serializer = self.get_serializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def batch_membership(self, request, model):
+        """
+        Пакетное добавление или удаление рецептов.
+
+        Все id проверяются одним запросом, в ответе статус
+        для каждого переданного id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        found = set(Recipe.objects.filter(
+            pk__in=recipe_ids).values_list('pk', flat=True))
+        ids = [recipe_id for recipe_id in recipe_ids if recipe_id in found]
+        if request.method == 'POST':
+            done = set(bulk_add(model, request.user.pk, ids))
+            statuses = ('added', 'exists')
+        else:
+            done = set(bulk_remove(model, request.user.pk, ids))
+            statuses = ('removed', 'absent')
+        return Response({'results': [
+            {'id': recipe_id,
+             'status': ('not_found' if recipe_id not in found
+                        else statuses[recipe_id not in done])}
+            for recipe_id in recipe_ids
+        ]})
+
+    @action(detail=False, methods=('post', 'delete'),
+            url_path='favorite', url_name='favorite-batch',
+            permission_classes=(IsAuthenticated,))
+    def favorite_batch(self, request):
+        """Метод для пакетного изменения избранного."""
+        return self.batch_membership(request, Favorite)
+
+    @action(detail=False, methods=('post', 'delete'),
+            url_path='shopping_cart', url_name='shopping-cart-batch',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_batch(self, request):
+        """Метод для пакетного изменения корзины."""
+        return self.batch_membership(request, Cart)
+
+    @action(detail=False, methods=('get',),
+            pagination_class=PantryPagination)
+    def pantry(self, request):
+        """
+        Метод для поиска рецептов по имеющимся продуктам.
+
+        Рецепты ранжируются по числу недостающих ингредиентов
+        индексом в памяти, из базы загружается только страница.
+        """
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            }
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            return Response(
+                {'errors': 'ingredients и max_missing должны быть числами'},
+                status=HTTP_400_BAD_REQUEST)
+        if not ingredient_ids or max_missing < 0:
+            return Response(
+                {'errors': 'Укажите ингредиенты и max_missing не меньше 0'},
+                status=HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(pantry_index.search(
+            ingredient_ids, max_missing,
+            request.query_params.getlist('tags')))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, matched, missing in page])
+        page = [row for row in page if row[0] in recipes]
+        data = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, matched, missing in page],
+            many=True).data
+        for item, (recipe_id, matched, missing) in zip(data, page):
+            item['matched'] = matched
+            item['missing'] = missing
+        return self.get_paginated_response(data)
+
+    @action(detail=True, methods=('get',), pagination_class=None)
+    def similar(self, request, pk=None):
+        """
+        Метод для получения похожих рецептов.
+
+        Список заранее посчитан командой update_similar_recipes,
+        поэтому ответ строится одним запросом к SimilarRecipe.
+        """
+        try:
+            recipe_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        items = list(SimilarRecipe.objects.filter(
+            recipe_id=recipe_id).select_related('similar').order_by(
+                '-score')[:settings.SIMILAR_RECIPES_COUNT])
+        if not items and not Recipe.objects.filter(pk=recipe_id).exists():
+            raise Http404
+        return Response(timed_serializer(SimilarRecipeSerializer(
+            items, many=True, context=self.get_serializer_context())).data)
+
+    @action(detail=False, methods=('get',),
+            pagination_class=None,
+            permission_classes=(IsAuthenticated,))
+    def shopping_list(self, request):
+        """
+        Метод для получения списка покупок.
+
+        Суммы ингредиентов корзины хранятся в ShoppingListItem
+        и поддерживаются при изменении корзины.
+        """
+        items = ShoppingListItem.objects.filter(
+            user=request.user).select_related(
+                'ingredient').order_by('ingredient__name')
+        return Response(timed_serializer(
+            ShoppingListItemSerializer(items, many=True)).data)
+
     @action(detail=False, methods=('get',),
             url_path='download_shopping_cart',
-            pagination_class=None)
+            pagination_class=None,
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(ShoppingListTextRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListPDFRenderer))
     def download_shopping_cart(self, request):
-        """Метод для скачивания ингредиентов в корзине в txt."""
+        """
+        Метод для скачивания ингредиентов в корзине.
+
+        Формат файла выбирается параметром ?format= (txt, csv, pdf).
+        """
         user = request.user
         if not user.cart.exists():
             return Response(
                 'В корзине нет товаров', status=HTTP_400_BAD_REQUEST)
 
-        text = 'Список покупок:\n\n'
-        ingredient_name = 'recipe__recipe__ingredient__name'
-        ingredient_unit = 'recipe__recipe__ingredient__measurement_unit'
-        recipe_amount = 'recipe__recipe__amount'
-        amount_sum = 'recipe__recipe__amount__sum'
-        cart = user.cart.select_related('recipe').values(
-            ingredient_name, ingredient_unit).annotate(Sum(
-                recipe_amount)).order_by(ingredient_name)
-        for _ in cart:
-            text += (
-                f'{_[ingredient_name]} ({_[ingredient_unit]})'
-                f' — {_[amount_sum]}\n'
-            )
-        response = HttpResponse(text, content_type='text/plain')
-        filename = 'shopping_list.txt'
+        rows = ShoppingListItem.objects.filter(user=user).values(
+            'ingredient_id', 'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('name').iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        if isinstance(request._request, ASGIRequest):
+            # Под ASGI тело ответа читается в event loop, где ORM недоступен.
+            rows = list(rows)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows), content_type=renderer.get_content_type())
+        filename = f'{renderer.filename}.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, SerializerTimingMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Viewset для модели Tag и TagSerializer."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny, ]
     pagination_class = None
+    catalog = TAGS_CATALOG
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, SerializerTimingMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Viewset для модели Ingredient и IngredientSerializer."""
 
     queryset = Ingredient.objects.all()
@@ -103,9 +294,41 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     filterset_class = IngredientFilter
     pagination_class = None
+    catalog = INGREDIENTS_CATALOG
+
+    def list(self, request, *args, **kwargs):
+        """
+        Переопределение метода list.
+
+        Поиск по названию обслуживается индексом в памяти
+        без обращения к базе данных.
+        """
+        if request.query_params.get('name') is None:
+            return super().list(request, *args, **kwargs)
+        return self.catalog_response(self.search, request)
+
+    def search(self, request):
+        """Поиск ингредиентов по названию в индексе."""
+        return Response(ingredient_index.search(
+            request.query_params['name'], settings.INGREDIENT_SEARCH_LIMIT))
+
+
+class CollectionViewSet(CreateDestroyViewSet):
+    """
+    Mixin для избранного и корзины.
+
+    Проверка и изменение коллекции выполняются под той же блокировкой
+    пользователя, что и пакетные изменения, поэтому счетчики и список
+    покупок не изменяются дважды.
+    """
 
+    def create(self, request, *args, **kwargs):
+        """Добавление рецепта под блокировкой пользователя."""
+        with user_lock(request.user.pk):
+            return super().create(request, *args, **kwargs)
 
-class FavoriteViewSet(CreateDestroyViewSet):
+
+class FavoriteViewSet(CollectionViewSet):
     """Viewset для Favorite и FavoriteSerializer."""
     serializer_class = FavoriteSerializer
 
@@ -134,19 +357,20 @@ class FavoriteViewSet(CreateDestroyViewSet):
     def delete(self, request, recipe_id):
         """Метод для удаления Favorite."""
         user = request.user
-        if not user.favorite.select_related(
-                'favorite_recipe').filter(
-                    recipe_id=recipe_id).exists():
-            return Response({'errors': 'Рецепта нет в избранном'},
-                            status=HTTP_400_BAD_REQUEST)
-        get_object_or_404(
-            Favorite,
-            user=request.user,
-            recipe_id=recipe_id).delete()
+        with user_lock(user.pk):
+            if not user.favorite.select_related(
+                    'favorite_recipe').filter(
+                        recipe_id=recipe_id).exists():
+                return Response({'errors': 'Рецепта нет в избранном'},
+                                status=HTTP_400_BAD_REQUEST)
+            get_object_or_404(
+                Favorite,
+                user=request.user,
+                recipe_id=recipe_id).delete()
         return Response(status=HTTP_204_NO_CONTENT)
 
 
-class ShoppingCartViewSet(CreateDestroyViewSet):
+class ShoppingCartViewSet(CollectionViewSet):
     """Viewset для Cart и ShoppingCartSerializer."""
 
     serializer_class = ShoppingCartSerializer
@@ -176,13 +400,39 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
     def delete(self, request, recipe_id):
         """Метод для удаления Cart."""
         user = request.user
-        if not user.cart.select_related(
-                'recipe').filter(
-                    recipe_id=recipe_id).exists():
-            return Response({'errors': 'Рецепта нет в корзине'},
-                            status=HTTP_400_BAD_REQUEST)
-        get_object_or_404(
-            Cart,
-            user=request.user,
-            recipe=recipe_id).delete()
+        with user_lock(user.pk):
+            if not user.cart.select_related(
+                    'recipe').filter(
+                        recipe_id=recipe_id).exists():
+                return Response({'errors': 'Рецепта нет в корзине'},
+                                status=HTTP_400_BAD_REQUEST)
+            get_object_or_404(
+                Cart,
+                user=request.user,
+                recipe=recipe_id).delete()
         return Response(status=HTTP_204_NO_CONTENT)
+
+
+class CacheStatsView(APIView):
+    """Счетчики кэша избранного и корзины для администратора."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        """Метод для получения счетчиков кэша."""
+        return Response({
+            'favorites': favorites.stats(),
+            'carts': carts.stats(),
+        })
+
+
+class MetricsView(APIView):
+    """Метрики запросов в текстовом формате Prometheus."""
+
+    permission_classes = (MetricsPermission,)
+
+    def get(self, request):
+        """Метод для получения метрик."""
+        return HttpResponse(
+            render_metrics((favorites, carts)),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -50,11 +50,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,6 +96,36 @@ DATABASES = {
     }
 }
 
+# Общий кэш процессов backend и команд manage.py: адрес memcached,
+# например CACHE_LOCATION=memcached:11211. В кэше хранятся версии
+# справочников, токены, избранное и корзина, поэтому локальный кэш
+# процесса подходит только для запуска в одном процессе.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_LOCATION,
+    } if CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Реплики для чтения: хосты postgres или файлы sqlite через запятую.
+DATABASE_REPLICAS = []
+REPLICA_SETTING = (
+    'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST')
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        REPLICA_SETTING: replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -139,6 +171,13 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+RECIPE_IMAGE_SIZES = {
+    'small': 320,
+    'medium': 640,
+    'large': 1280,
+}
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -151,7 +190,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -161,9 +204,39 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6
 }
 
+INGREDIENT_SEARCH_LIMIT = 20
+
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+# Удаленный токен перестает действовать во всех процессах сразу только
+# с общим кэшем. В кэше процесса другие воркеры принимают его еще
+# до AUTH_TOKEN_CACHE_TIMEOUT секунд, поэтому срок хранения короткий.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv(
+    'AUTH_TOKEN_CACHE_TIMEOUT', default=60 if CACHE_LOCATION else 5))
+
+FEED_MAX_LENGTH = 500
+FEED_FAN_OUT_WORKERS = int(os.getenv('FEED_FAN_OUT_WORKERS', default=2))
+
+BATCH_RECIPES_LIMIT = 100
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_TAG_WEIGHT = 0.25
+
+SERVER_TIMING_HEADER = os.getenv(
+    'SERVER_TIMING_HEADER', default='True') == 'True'
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', default='127.0.0.1').split(',')
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', default=16))
+
 
 DJOSER = {
     'LOGIN_FIELD': 'email',
     "SEND_ACTIVATION_EMAIL": False,
     'HIDE_USERS': False,
 }
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
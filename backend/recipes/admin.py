@@ -1,9 +1,10 @@
 """Write here Admin settings for recipes app."""
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (Cart, Favorite, Tag, Recipe,
                      Ingredient, RecipeIngredient)
+from .changes import recipe_ingredients_changed
+from .shopping_list import refresh_recipes
 
 EMPTY_DISPLAY = '-пусто-'
 
@@ -18,22 +19,27 @@ class RecipeAdmin(admin.ModelAdmin):
 
     inlines = (IngredientAmountAdmin,)
     list_display = ('id', 'name', 'author', 'text',
-                    'cooking_time', 'pub_date', 'favorite_count')
+                    'cooking_time', 'pub_date', 'favorites_count',
+                    'carts_count')
     search_fields = ('name', 'author', 'tags')
     filter_vertical = ('tags',)
     list_filter = ('name', 'author', 'tags')
+    readonly_fields = ('favorites_count', 'carts_count')
     empty_value_display = EMPTY_DISPLAY
 
-    def get_queryset(self, request):
-        """Переопределение метода get_queryset RecipeAdmin."""
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            obj_count=Count("favorite_recipe", distinct=True),
-        )
-
-    def favorite_count(self, obj):
-        """Метод для получения подсчета избранного."""
-        return obj.obj_count
+    def save_related(self, request, form, formsets, change):
+        """
+        Обновление рецепта после сохранения ингредиентов.
+
+        Поисковый индекс, журнал и версия рецепта обновляются
+        один раз после сохранения всех строк ингредиентов.
+        """
+        super().save_related(request, form, formsets, change)
+        recipe_ingredients_changed([form.instance.pk])
+        if change:
+            refresh_recipes([form.instance.pk])
+            Recipe.objects.filter(pk=form.instance.pk).update(
+                similar_stale=True)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -7,3 +7,7 @@ class RecipesConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        """Подключение сигналов приложения recipes."""
+        from . import signals  # noqa: F401
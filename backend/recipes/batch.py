@@ -0,0 +1,77 @@
+"""
+Пакетное добавление и удаление рецептов в избранном и корзине.
+
+bulk_create не отправляет сигналы, поэтому при добавлении кэш
+id рецептов, счетчики рецептов и список покупок обновляются здесь
+так же, как в обработчиках сигналов. Удаление выполняется через
+QuerySet.delete(), и их обновляют обработчики сигналов удаления.
+
+Пакетные и одиночные изменения коллекций пользователя выполняются
+под блокировкой пользователя (user_lock), поэтому рецепты, найденные
+в базе перед вставкой, не могут быть добавлены параллельно.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from users.models import User
+
+from .counters import change_counters
+from .membership import carts, favorites
+from .models import Cart, Favorite, Recipe
+from .shopping_list import add_recipes
+
+COLLECTIONS = {
+    Favorite: (favorites, 'favorites_count'),
+    Cart: (carts, 'carts_count'),
+}
+
+
+@contextmanager
+def user_lock(user_id):
+    """Транзакция с блокировкой пользователя до ее завершения."""
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            pk=user_id).values_list('pk'))
+        yield
+
+
+def bulk_add(model, user_id, recipe_ids):
+    """
+    Добавление рецептов в избранное или корзину пользователя.
+
+    Возвращает id добавленных рецептов, без уже добавленных ранее.
+    """
+    membership, counter = COLLECTIONS[model]
+    with user_lock(user_id):
+        existing = set(model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        added = [recipe_id for recipe_id in recipe_ids
+                 if recipe_id not in existing]
+        if not added:
+            return added
+        model.objects.bulk_create(
+            [model(user_id=user_id, recipe_id=recipe_id)
+             for recipe_id in added],
+            ignore_conflicts=True)
+        change_counters(Recipe, added, counter, 1)
+        if model is Cart:
+            add_recipes(user_id, added)
+    membership.invalidate(user_id)
+    return added
+
+
+def bulk_remove(model, user_id, recipe_ids):
+    """
+    Удаление рецептов из избранного или корзины пользователя.
+
+    Возвращает id удаленных рецептов.
+    """
+    with user_lock(user_id):
+        queryset = model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids)
+        removed = list(queryset.values_list('recipe_id', flat=True))
+        if removed:
+            queryset.delete()
+    return removed
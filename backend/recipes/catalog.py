@@ -0,0 +1,36 @@
+"""Версии справочников приложения recipes."""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'catalog_version:{}'
+INGREDIENTS_CATALOG = 'ingredients'
+TAGS_CATALOG = 'tags'
+RECIPES_CATALOG = 'recipes'
+
+
+def get_catalog_version(name):
+    """
+    Текущая версия справочника.
+
+    Версия хранится в общем кэше CACHES, поэтому смена версии
+    командой manage.py видна всем процессам backend.
+    """
+    key = CATALOG_VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_catalog_version(name):
+    """
+    Смена версии справочника после изменения данных.
+
+    Версия меняется после фиксации транзакции, иначе параллельный
+    запрос закэширует под новой версией еще не зафиксированные строки.
+    """
+    transaction.on_commit(lambda: cache.set(
+        CATALOG_VERSION_KEY.format(name), time.time_ns(), None))
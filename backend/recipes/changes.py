@@ -0,0 +1,68 @@
+"""
+Журнал изменений рецептов.
+
+Каждое изменение рецептов получает номер из счетчика в кэше Django,
+а id измененных рецептов хранятся под ключом с этим номером.
+Индексы в памяти процессов по журналу обновляют только измененные
+рецепты. Если часть журнала недоступна, индекс строится заново.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Recipe
+from .search import update_search_index
+
+RECIPE_CHANGES_KEY = 'recipe_changes'
+RECIPE_CHANGE_KEY = 'recipe_changes:{}'
+RECIPE_CHANGES_TIMEOUT = 24 * 60 * 60
+
+
+def get_last_change():
+    """Номер последнего изменения рецептов."""
+    cache.add(RECIPE_CHANGES_KEY, 0, None)
+    return cache.get(RECIPE_CHANGES_KEY)
+
+
+def write_recipe_changes(recipe_ids):
+    """Запись изменения; None означает неизвестный набор рецептов."""
+    get_last_change()
+    number = cache.incr(RECIPE_CHANGES_KEY)
+    if recipe_ids is not None:
+        cache.set(RECIPE_CHANGE_KEY.format(number), list(recipe_ids),
+                  RECIPE_CHANGES_TIMEOUT)
+
+
+def log_recipe_changes(recipe_ids=None):
+    """Запись изменения рецептов после коммита транзакции."""
+    transaction.on_commit(lambda: write_recipe_changes(recipe_ids))
+
+
+def get_recipe_changes(since):
+    """
+    Рецепты, измененные после изменения с номером since.
+
+    Возвращает номер последнего изменения и множество id рецептов
+    или None, если журнал неполон и индекс нужно построить заново.
+    """
+    last = get_last_change()
+    if since is None or since > last:
+        return last, None
+    keys = [RECIPE_CHANGE_KEY.format(number)
+            for number in range(since + 1, last + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        return last, None
+    return last, set().union(*changes.values())
+
+
+def recipe_ingredients_changed(recipe_ids):
+    """
+    Обновление рецептов после записи их ингредиентов.
+
+    Вызывается один раз на запись рецептов, а не на каждую строку
+    RecipeIngredient: поисковый индекс, журнал и версия рецептов.
+    """
+    recipe_ids = list(recipe_ids)
+    update_search_index(recipe_ids)
+    log_recipe_changes(recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).touch()
@@ -0,0 +1,80 @@
+"""
+Счетчики рецептов и пользователей.
+
+Recipe.favorites_count, Recipe.carts_count, User.recipes_count
+и User.followers_count обновляются сигналами через F() выражения
+и пересчитываются пакетно командой recount_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Follow, User
+
+from .models import Cart, Favorite, Recipe
+
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'carts_count': (Cart, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Follow, 'following'),
+}
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счетчика field объекта pk на delta."""
+    change_counters(model, [pk], field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарное изменение счетчика field объектов pks одним запросом."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    """Подзапрос количества строк model, ссылающихся на объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def recount(model, counters, batch_size, ids=None):
+    """
+    Пересчет счетчиков model пакетами по batch_size объектов.
+
+    Возвращает количество обработанных объектов.
+    """
+    queryset = model.objects.order_by('pk')
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    values = {name: count_subquery(*source)
+              for name, source in counters.items()}
+    last_pk, processed = 0, 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).values_list(
+            'pk', flat=True)[:batch_size])
+        if not batch:
+            return processed
+        with transaction.atomic():
+            model.objects.filter(pk__in=batch).update(**values)
+        last_pk = batch[-1]
+        processed += len(batch)
+
+
+def recount_recipes(batch_size=1000, ids=None):
+    """Пересчет счетчиков избранного и корзины рецептов."""
+    return recount(Recipe, RECIPE_COUNTERS, batch_size, ids)
+
+
+def recount_users(batch_size=1000, ids=None):
+    """Пересчет счетчиков рецептов и подписчиков пользователей."""
+    return recount(User, USER_COUNTERS, batch_size, ids)
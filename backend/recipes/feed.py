@@ -0,0 +1,114 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+
+Лента хранится в FeedEntry и заполняется при записи: новый рецепт
+добавляется в ленты всех подписчиков автора, подписка добавляет
+последние рецепты автора, отписка удаляет их. Длина ленты каждого
+пользователя ограничена FEED_MAX_LENGTH последними рецептами.
+
+Рассылка нового рецепта занимает время, пропорциональное числу
+подписчиков, поэтому выполняется после коммита в пуле потоков,
+вне запроса создания рецепта.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections
+
+from users.models import Follow
+
+from .models import FeedEntry, Recipe
+from .utils import batched
+
+logger = logging.getLogger(__name__)
+
+FEED_BATCH_SIZE = 1000
+TRIM_SQL = '''
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY pub_date DESC, recipe_id DESC
+            ) AS position
+            FROM {table} WHERE user_id IN ({placeholders})
+        ) AS ranked WHERE position > %s
+    )
+'''
+
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.FEED_FAN_OUT_WORKERS,
+    thread_name_prefix='recipe-feed')
+
+
+def trim_feeds(user_ids):
+    """Удаление записей сверх FEED_MAX_LENGTH из лент пользователей."""
+    for batch in batched(user_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(TRIM_SQL.format(
+                table=FeedEntry._meta.db_table,
+                placeholders=', '.join(['%s'] * len(batch))
+            ), [*batch, settings.FEED_MAX_LENGTH])
+
+
+def fan_out_recipe(recipe_id, author_id, pub_date):
+    """Добавление нового рецепта в ленты подписчиков автора."""
+    if not Recipe.objects.filter(pk=recipe_id).exists():
+        return
+    follower_ids = Follow.objects.filter(
+        following_id=author_id).values_list('user_id', flat=True)
+    for batch in batched(follower_ids.iterator()):
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id, pub_date=pub_date)
+            for user_id in batch
+        ], ignore_conflicts=True)
+        trim_feeds(batch)
+
+
+def process_fan_out(recipe_id, author_id, pub_date):
+    """Рассылка рецепта в ленты в потоке пула."""
+    try:
+        fan_out_recipe(recipe_id, author_id, pub_date)
+    except Exception:
+        logger.exception('Ошибка рассылки рецепта %s в ленты', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_fan_out(recipe_id, author_id, pub_date):
+    """Постановка рассылки нового рецепта в очередь."""
+    return executor.submit(process_fan_out, recipe_id, author_id, pub_date)
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавление последних рецептов автора в ленту пользователя."""
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                  author_id=author_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes[:settings.FEED_MAX_LENGTH]
+    ], ignore_conflicts=True)
+    trim_feeds([user_id])
+
+
+def remove_author_from_feed(user_id, author_id):
+    """Удаление рецептов автора из ленты пользователя."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feeds(user_ids):
+    """Пересборка лент пользователей по их подпискам."""
+    for user_id in user_ids:
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        recipes = Recipe.objects.filter(
+            author__following__user_id=user_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'author_id', 'pub_date')
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id, pub_date=pub_date)
+            for recipe_id, author_id, pub_date
+            in recipes[:settings.FEED_MAX_LENGTH]
+        ], batch_size=FEED_BATCH_SIZE)
@@ -0,0 +1,117 @@
+"""
+Производные изображения рецептов.
+
+Картинка рецепта уменьшается до размеров RECIPE_IMAGE_SIZES
+в форматах WebP и JPEG в пуле потоков, вне потока запроса.
+Пути к готовым файлам сохраняются в Recipe.image_derivatives
+и удаляются вместе с рецептом.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'recipes/derivatives'
+IMAGE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+
+# Image.Resampling появился в Pillow 9.1, константы Image.LANCZOS
+# в Pillow 10 нет.
+LANCZOS = getattr(Image, 'Resampling', Image).LANCZOS
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images')
+
+
+def to_rgb(image):
+    """Перевод изображения в RGB с белым фоном вместо прозрачности."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_derivatives(source):
+    """Генератор (размер, формат, байты) производных изображения."""
+    with Image.open(source) as image:
+        image = to_rgb(ImageOps.exif_transpose(image))
+    for size, width in settings.RECIPE_IMAGE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), LANCZOS)
+        for extension, options in IMAGE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            yield size, extension, buffer.getvalue()
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Создание производных изображения рецепта."""
+    try:
+        stem = os.path.splitext(os.path.basename(image_name))[0]
+        derivatives = {'source': image_name, 'sizes': {}}
+        with default_storage.open(image_name) as source:
+            for size, extension, content in render_derivatives(source):
+                path = default_storage.save(
+                    f'{DERIVATIVES_DIR}/{stem}_{size}.{extension}',
+                    ContentFile(content))
+                derivatives['sizes'].setdefault(size, {})[extension] = path
+        previous = Recipe.objects.filter(
+            pk=recipe_id).values_list('image_derivatives', flat=True).first()
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image_derivatives=derivatives,
+                 version=F('version') + 1, updated_at=timezone.now())
+        delete_derivatives(derivatives if not updated else previous)
+    except Exception:
+        logger.exception('Ошибка обработки картинки рецепта %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def delete_derivatives(derivatives):
+    """Удаление файлов производных изображения."""
+    for formats in (derivatives or {}).get('sizes', {}).values():
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def schedule_recipe_image(recipe_id, image_name):
+    """Постановка картинки рецепта в очередь обработки."""
+    return executor.submit(process_recipe_image, recipe_id, image_name)
+
+
+def needs_processing(recipe):
+    """Проверка, что производные не соответствуют картинке рецепта."""
+    return bool(recipe.image) and (
+        recipe.image_derivatives.get('source') != recipe.image.name)
+
+
+def get_derivative_urls(derivatives, request=None):
+    """Ссылки на производные изображения по размерам и форматам."""
+    urls = {}
+    for size, formats in (derivatives or {}).get('sizes', {}).items():
+        urls[size] = {}
+        for extension, path in formats.items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[size][extension] = url
+    return urls
@@ -0,0 +1,174 @@
+"""Write your generate_fake_data command here."""
+import os
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.changes import log_recipe_changes
+from recipes.counters import recount_recipes, recount_users
+from recipes.feed import rebuild_feeds
+from recipes.models import (Cart, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from recipes.search import update_search_index
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.utils import batched
+from users.models import Follow, User
+
+WORDS = (
+    'нарезать', 'обжарить', 'добавить', 'посолить', 'перемешать',
+    'запекать', 'варить', 'тушить', 'подавать', 'охладить', 'смешать',
+    'взбить', 'минут', 'до', 'готовности', 'на', 'среднем', 'огне',
+    'с', 'и', 'в', 'духовке', 'сковороде', 'кастрюле', 'соусом',
+)
+FAKE_PASSWORD = 'fake-password'
+
+
+def random_pairs(left, right, count, exclude_equal=False):
+    """Генератор случайных пар (left, right) без повторов."""
+    seen = set()
+    limit = len(left) * len(right)
+    attempts = 0
+    while len(seen) < min(count, limit) and attempts < count * 10:
+        attempts += 1
+        pair = (random.choice(left), random.choice(right))
+        if pair in seen or (exclude_equal and pair[0] == pair[1]):
+            continue
+        seen.add(pair)
+        yield pair
+
+
+class Command(BaseCommand):
+    """Класс Command для генерации тестовых данных."""
+
+    help = 'Генерация пользователей, рецептов, избранного, корзин, подписок'
+
+    def add_arguments(self, parser):
+        """Аргументы команды generate_fake_data."""
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def log(self, message):
+        """Вывод прогресса с учетом verbosity."""
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def bulk_create(self, model, objs):
+        """Пакетная вставка с игнорированием конфликтов."""
+        created = 0
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(
+                batch, batch_size=self.batch_size, ignore_conflicts=True)
+            created += len(batch)
+        self.log(f'{model._meta.verbose_name_plural}: {created}')
+
+    def create_users(self, count):
+        """Создание пользователей с одинаковым паролем."""
+        last_id = User.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        password = make_password(FAKE_PASSWORD)
+        prefix = f'fake{last_id}_'
+        self.bulk_create(User, (
+            User(username=f'{prefix}{index}',
+                 email=f'{prefix}{index}@example.com',
+                 first_name=f'Имя{index}', last_name=f'Фамилия{index}',
+                 password=password)
+            for index in range(count)))
+        return list(User.objects.filter(pk__gt=last_id).values_list(
+            'pk', flat=True))
+
+    def create_recipes(self, count, author_ids, images):
+        """Создание рецептов из названий ингредиентов."""
+        last_id = Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        names = list(Ingredient.objects.values_list('name', flat=True)[:500])
+        self.bulk_create(Recipe, (
+            Recipe(author_id=random.choice(author_ids),
+                   name=' с '.join(random.choices(names, k=2))[:100],
+                   text=' '.join(random.choices(WORDS, k=40)),
+                   image=random.choice(images),
+                   cooking_time=random.randint(5, 180))
+            for _ in range(count)))
+        return list(Recipe.objects.filter(pk__gt=last_id).values_list(
+            'pk', flat=True))
+
+    def create_recipe_relations(self, recipe_ids, options):
+        """Создание тэгов и ингредиентов рецептов."""
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        tags_count = min(options['tags_per_recipe'], len(tag_ids))
+        ingredients_count = min(
+            options['ingredients_per_recipe'], len(ingredient_ids))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in random.sample(tag_ids, tags_count)))
+        self.bulk_create(RecipeIngredient, (
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=random.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in random.sample(
+                ingredient_ids, ingredients_count)))
+
+    def get_images(self):
+        """Картинки из media/recipes для рецептов."""
+        directory = os.path.join(settings.MEDIA_ROOT, 'recipes')
+        if not os.path.isdir(directory):
+            return ['recipes/default.jpg']
+        images = [f'recipes/{name}' for name in sorted(os.listdir(directory))
+                  if os.path.isfile(os.path.join(directory, name))]
+        return images or ['recipes/default.jpg']
+
+    def handle(self, *args, **options):
+        """Метод, генерирующий тестовые данные пакетными вставками."""
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        if not Ingredient.objects.exists() or not Tag.objects.exists():
+            raise CommandError(
+                'Сначала загрузите справочники командой load_catalog')
+        random.seed(options['seed'])
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            if not user_ids:
+                raise CommandError('--users должен быть больше 0')
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, self.get_images())
+            self.create_recipe_relations(recipe_ids, options)
+            for batch in batched(recipe_ids, self.batch_size):
+                update_search_index(batch)
+            if recipe_ids:
+                self.bulk_create(Favorite, (
+                    Favorite(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in random_pairs(
+                        user_ids, recipe_ids, options['favorites'])))
+                self.bulk_create(Cart, (
+                    Cart(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in random_pairs(
+                        user_ids, recipe_ids, options['carts'])))
+            self.bulk_create(Follow, (
+                Follow(user_id=user_id, following_id=following_id)
+                for user_id, following_id in random_pairs(
+                    user_ids, user_ids, options['follows'],
+                    exclude_equal=True)))
+            recount_recipes(self.batch_size, recipe_ids)
+            recount_users(self.batch_size, user_ids)
+            rebuild_feeds(user_ids)
+            rebuild_shopping_lists(user_ids)
+            log_recipe_changes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}. '
+            f'Пароль пользователей: {FAKE_PASSWORD}'))
@@ -0,0 +1,160 @@
+"""Write your load_catalog import here."""
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.catalog import (INGREDIENTS_CATALOG, TAGS_CATALOG,
+                             bump_catalog_version)
+from recipes.models import Ingredient, Tag
+from recipes.utils import batched
+
+CATALOGS = {
+    INGREDIENTS_CATALOG: {
+        'model': Ingredient,
+        'fields': ('name', 'measurement_unit'),
+        'key': ('name', 'measurement_unit'),
+    },
+    TAGS_CATALOG: {
+        'model': Tag,
+        'fields': ('name', 'color', 'slug'),
+        'key': ('slug',),
+    },
+}
+FORMATS = ('csv', 'json')
+JSON_READ_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    """Чтение строк csv файла без заголовка."""
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """
+    Потоковое чтение json файла.
+
+    Поддерживается массив объектов и объекты по одному на строку.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if eof:
+                return
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield {field: item[field] for field in fields}
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class Command(BaseCommand):
+    """Класс Command для импорта справочников из csv и json в db."""
+
+    help = 'Загрузка справочника ingredients или tags из csv или json'
+
+    def add_arguments(self, parser):
+        """Аргументы команды load_catalog."""
+        parser.add_argument('catalog', choices=sorted(CATALOGS))
+        parser.add_argument(
+            '--path',
+            help='Путь к файлу, по умолчанию data/<catalog>.<format>')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одном запросе к db')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Показать изменения без записи в db')
+
+    def get_source(self, catalog, path, file_format):
+        """Путь и формат файла справочника."""
+        if path is None:
+            for default_format in FORMATS:
+                path = os.path.join(
+                    settings.BASE_DIR, 'data', f'{catalog}.{default_format}')
+                if os.path.exists(path):
+                    break
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        return path, file_format
+
+    def get_new_rows(self, config, batch):
+        """Строки пачки, которых еще нет в db."""
+        key = config['key']
+        existing = set(config['model'].objects.filter(**{
+            f'{key[0]}__in': {row[key[0]] for row in batch}
+        }).values_list(*key))
+        return [row for row in batch
+                if tuple(row[field] for field in key) not in existing]
+
+    def handle(self, *args, **options):
+        """Метод импортирующий данные справочника."""
+        catalog = options['catalog']
+        config = CATALOGS[catalog]
+        model = config['model']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        path, file_format = self.get_source(
+            catalog, options['path'], options['format'])
+
+        processed = new = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            count_before = model.objects.count()
+            rows = READERS[file_format](file, config['fields'])
+            for batch in batched(rows, batch_size):
+                processed += len(batch)
+                if dry_run:
+                    new_rows = self.get_new_rows(config, batch)
+                    new += len(new_rows)
+                    if options['verbosity'] > 1:
+                        for row in new_rows:
+                            self.stdout.write(
+                                '+ ' + ', '.join(map(str, row.values())))
+                else:
+                    model.objects.bulk_create(
+                        (model(**row) for row in batch),
+                        batch_size=batch_size,
+                        ignore_conflicts=True)
+                if options['verbosity'] > 0:
+                    self.stdout.write(f'Обработано строк: {processed}')
+            if not dry_run:
+                new = model.objects.count() - count_before
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Пробный запуск: будет добавлено {new}, '
+                f'уже в db {processed - new}'))
+            return
+        bump_catalog_version(catalog)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено {new}, пропущено {processed - new}'))
@@ -0,0 +1,32 @@
+"""Write your process_recipe_images command here."""
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import needs_processing, schedule_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Класс Command для создания уменьшенных копий картинок рецептов."""
+
+    help = 'Создание уменьшенных копий картинок рецептов'
+
+    def add_arguments(self, parser):
+        """Аргументы команды process_recipe_images."""
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обработать все рецепты, а не только необработанные')
+
+    def handle(self, *args, **options):
+        """Метод, обрабатывающий картинки рецептов в пуле потоков."""
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_derivatives')
+        futures = [
+            schedule_recipe_image(recipe.pk, recipe.image.name)
+            for recipe in recipes.iterator()
+            if options['all'] or needs_processing(recipe)
+        ]
+        wait(futures)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(futures)}'))
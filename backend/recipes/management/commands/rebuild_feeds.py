@@ -0,0 +1,22 @@
+"""Write your rebuild_feeds command here."""
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feeds
+from recipes.models import FeedEntry
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    """Класс Command для пересборки лент подписок."""
+
+    help = 'Пересборка лент подписок пользователей'
+
+    def handle(self, *args, **options):
+        """Метод, пересобирающий ленты всех пользователей с подписками."""
+        user_ids = set(Follow.objects.values_list(
+            'user_id', flat=True).distinct())
+        user_ids.update(FeedEntry.objects.values_list(
+            'user_id', flat=True).distinct())
+        rebuild_feeds(sorted(user_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}'))
@@ -0,0 +1,21 @@
+"""Write your rebuild_shopping_lists command here."""
+from django.core.management.base import BaseCommand
+
+from recipes.models import Cart, ShoppingListItem
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """Класс Command для пересборки списков покупок."""
+
+    help = 'Пересборка списков покупок пользователей по корзинам'
+
+    def handle(self, *args, **options):
+        """Метод, пересобирающий списки покупок всех пользователей."""
+        user_ids = set(Cart.objects.values_list(
+            'user_id', flat=True).distinct())
+        user_ids.update(ShoppingListItem.objects.values_list(
+            'user_id', flat=True).distinct())
+        rebuild_shopping_lists(sorted(user_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано списков покупок: {len(user_ids)}'))
@@ -0,0 +1,26 @@
+"""Write your recount_counters command here."""
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import recount_recipes, recount_users
+
+
+class Command(BaseCommand):
+    """Класс Command для пересчета счетчиков рецептов и пользователей."""
+
+    help = 'Пересчет счетчиков избранного, корзины, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        """Аргументы команды recount_counters."""
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов в одном запросе к db')
+
+    def handle(self, *args, **options):
+        """Метод, пересчитывающий счетчики пакетами."""
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        recipes = recount_recipes(batch_size)
+        users = recount_users(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}'))
@@ -0,0 +1,22 @@
+"""Write your update_similar_recipes command here."""
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import update_similar_recipes
+
+
+class Command(BaseCommand):
+    """Класс Command для пересчета похожих рецептов."""
+
+    help = 'Пересчет похожих рецептов по ингредиентам и тэгам'
+
+    def add_arguments(self, parser):
+        """Аргументы команды update_similar_recipes."""
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только измененные')
+
+    def handle(self, *args, **options):
+        """Метод, пересчитывающий похожие рецепты."""
+        updated = update_similar_recipes(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {updated}'))
@@ -0,0 +1,78 @@
+"""
+Кэш избранного и корзины пользователей.
+
+Для каждого пользователя в общем кэше хранится множество id рецептов
+в избранном и в корзине для флагов is_favorited и is_in_shopping_cart.
+Множество загружается из db при первом обращении, а при добавлении
+и удалении рецептов ключ удаляется сразу и после коммита транзакции,
+поэтому одновременные изменения не теряются.
+"""
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Cart, Favorite
+
+
+class MembershipCache:
+    """Кэш id рецептов пользователя для модели Favorite или Cart."""
+
+    def __init__(self, name, model):
+        """Инициализация кэша для модели model."""
+        self.name = name
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def get_key(self, user_id):
+        """Ключ кэша пользователя."""
+        return f'membership:{self.name}:{user_id}'
+
+    def _count(self, hit):
+        """Подсчет попаданий и промахов кэша."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_ids(self, user):
+        """Множество id рецептов пользователя."""
+        key = self.get_key(user.pk)
+        recipe_ids = cache.get(key)
+        self._count(recipe_ids is not None)
+        if recipe_ids is None:
+            # Множество живет в кэше до изменения, поэтому
+            # загружается из основной базы, а не из реплики.
+            recipe_ids = frozenset(self.model.objects.using(
+                DEFAULT_DB_ALIAS).filter(user=user).values_list(
+                    'recipe_id', flat=True))
+            cache.set(key, recipe_ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+        return recipe_ids
+
+    def invalidate(self, user_id):
+        """
+        Удаление множества пользователя из кэша.
+
+        Повторное удаление после коммита убирает множество,
+        загруженное другим процессом до коммита изменений.
+        """
+        key = self.get_key(user_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    def stats(self):
+        """Счетчики попаданий и промахов кэша."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else None,
+        }
+
+
+favorites = MembershipCache('favorite', Favorite)
+carts = MembershipCache('cart', Cart)
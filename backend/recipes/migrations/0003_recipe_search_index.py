@@ -0,0 +1,67 @@
+from django.db import migrations
+
+PG_FORWARD_SQL = (
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    'CREATE INDEX recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    '''
+    UPDATE recipes_recipe AS r SET search_vector =
+        setweight(to_tsvector('russian', r.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM recipes_recipeingredient AS ri
+            JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = r.id), '')), 'B')
+        || setweight(to_tsvector('russian', r.text), 'C')
+    ''',
+)
+PG_BACKWARD_SQL = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_FORWARD_SQL = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts '
+    'USING fts5(name, ingredients, text)',
+    '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT r.id, r.name, coalesce((
+        SELECT group_concat(i.name, ' ')
+        FROM recipes_recipeingredient AS ri
+        JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id), ''), r.text
+    FROM recipes_recipe AS r
+    ''',
+)
+SQLITE_BACKWARD_SQL = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_vendor_sql(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    run_vendor_sql(schema_editor, {
+        'postgresql': PG_FORWARD_SQL,
+        'sqlite': SQLITE_FORWARD_SQL,
+    })
+
+
+def backwards(apps, schema_editor):
+    run_vendor_sql(schema_editor, {
+        'postgresql': PG_BACKWARD_SQL,
+        'sqlite': SQLITE_BACKWARD_SQL,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            apps.get_model('recipes', 'Favorite'), 'recipe'),
+        carts_count=count_subquery(
+            apps.get_model('recipes', 'Cart'), 'recipe'))
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(
+            apps.get_model('users', 'Follow'), 'following'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_derivatives'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в корзину'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    user_ids = Follow.objects.values_list('user_id', flat=True).distinct()
+    for user_id in user_ids.iterator():
+        recipes = Recipe.objects.filter(
+            author__following__user_id=user_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'author_id', 'pub_date')[:settings.FEED_MAX_LENGTH]
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id, pub_date=pub_date)
+            for recipe_id, author_id, pub_date in recipes
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:34
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при каждом изменении рецепта', verbose_name='Версия'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
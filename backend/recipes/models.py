@@ -1,7 +1,10 @@
 """Set your Posts models here."""
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from users.models import CounterFieldsMixin, Follow
 
 User = get_user_model()
 
@@ -52,13 +55,73 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('id',)
+        constraints = [models.UniqueConstraint(
+            fields=['name', 'measurement_unit'],
+            name='unique_ingredient_measurement_unit')
+        ]
 
     def __str__(self) -> str:
         """Функция __str__ модели Ingredient."""
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet модели Recipe."""
+
+    def with_columns(self, fields=None):
+        """
+        Рецепты без колонок, не нужных для полей ответа fields.
+
+        text и image_derivatives читаются только если запрошены.
+        """
+        if fields is None:
+            return self
+        deferred = [name for field, name in (('text', 'text'),
+                                             ('images', 'image_derivatives'))
+                    if field not in fields]
+        return self.defer(*deferred) if deferred else self
+
+    def with_related(self, fields=None):
+        """
+        Подгрузка автора, тэгов и ингредиентов рецептов.
+
+        При переданном множестве полей ответа fields подгружаются
+        только нужные связи и колонки.
+        """
+        queryset = self.with_columns(fields)
+        if fields is None:
+            fields = {'author', 'tags', 'ingredients'}
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('recipe',
+                         queryset=RecipeIngredient.objects.select_related(
+                             'ingredient').order_by('pk')))
+        return queryset
+
+    def in_collection(self, model, user):
+        """Рецепты из избранного или корзины user по модели model."""
+        return self.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
+
+    def touch(self):
+        """Увеличение версии и даты изменения рецептов."""
+        return self.update(version=models.F('version') + 1,
+                           updated_at=timezone.now())
+
+    def with_subscription(self, user):
+        """Аннотация флага подписки на автора."""
+        if not user.is_authenticated:
+            return self.annotate(author_is_subscribed=Value(
+                False, output_field=models.BooleanField()))
+        return self.annotate(author_is_subscribed=Exists(
+            Follow.objects.filter(user=user, following=OuterRef('author'))))
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель рецептов."""
 
     name: str = models.CharField(verbose_name='Название рецепта',
@@ -73,6 +136,11 @@ class Recipe(models.Model):
     )
     image = models.ImageField('Картинка',
                               upload_to='recipes')
+    image_derivatives = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False)
     text = models.TextField(verbose_name='Описание рецепта',
                             help_text='Опишите рецепт')
     ingredients = models.ManyToManyField(Ingredient,
@@ -87,6 +155,30 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации',
                                     help_text='Укажите дату')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Версия',
+        help_text='Увеличивается при каждом изменении рецепта')
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в избранное')
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в корзину')
+    similar_stale = models.BooleanField(
+        default=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Похожие рецепты требуют пересчета')
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'carts_count')
+    background_fields = ('image_derivatives', 'similar_stale')
 
     class Meta:
         """Meta модели Recipe."""
@@ -94,11 +186,26 @@ class Recipe(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [models.Index(fields=['-pub_date', '-id'],
+                                name='recipe_pub_date_id_idx'),
+                   models.Index(fields=['author', '-pub_date', '-id'],
+                                name='recipe_author_pub_date_idx'),
+                   models.Index(fields=['-favorites_count', '-id'],
+                                name='recipe_favorites_count_idx')]
 
     def __str__(self) -> str:
         """Функция __str__ модели Recipe."""
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Сохранение рецепта с увеличением версии."""
+        adding = self._state.adding
+        if not adding:
+            self.version = models.F('version') + 1
+        super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=['version'])
+
 
 class RecipeIngredient(models.Model):
     """Модель для связи моделей Recipe Ingredient."""
@@ -182,3 +289,112 @@ class Favorite(models.Model):
         """Функция __str__ модели Cart."""
         return (f'{self.recipe.name} в избранном'
                 f'у пользователя {self.user.username}')
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель списка покупок.
+
+    Суммарное количество ингредиента во всех рецептах корзины
+    пользователя. Обновляется при изменении корзины и ингредиентов
+    рецептов в корзине.
+    """
+
+    user = models.ForeignKey(User,
+                             verbose_name='Пользователь',
+                             on_delete=models.CASCADE,
+                             related_name='shopping_list')
+    ingredient = models.ForeignKey(Ingredient,
+                                   verbose_name='Ингредиент',
+                                   on_delete=models.CASCADE,
+                                   related_name='+')
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        """Meta модели ShoppingListItem."""
+
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'ingredient'],
+            name='unique_shopping_list_item')]
+
+    def __str__(self) -> str:
+        """Функция __str__ модели ShoppingListItem."""
+        return (f'{self.ingredient_id} — {self.amount} в списке покупок '
+                f'пользователя {self.user_id}')
+
+
+class SimilarRecipe(models.Model):
+    """
+    Модель похожих рецептов.
+
+    Строка списка похожих рецептов рецепта recipe с оценкой
+    сходства по ингредиентам и тэгам. Заполняется командой
+    update_similar_recipes.
+    """
+
+    recipe = models.ForeignKey(Recipe,
+                               verbose_name='Рецепт',
+                               on_delete=models.CASCADE,
+                               related_name='similar')
+    similar = models.ForeignKey(Recipe,
+                                verbose_name='Похожий рецепт',
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    score = models.FloatField(verbose_name='Оценка сходства')
+
+    class Meta:
+        """Meta модели SimilarRecipe."""
+
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'similar'],
+            name='unique_similar_recipe')]
+        indexes = [models.Index(fields=['recipe', '-score'],
+                                name='similar_recipe_score_idx')]
+
+    def __str__(self) -> str:
+        """Функция __str__ модели SimilarRecipe."""
+        return f'{self.similar_id} похож на {self.recipe_id}'
+
+
+class FeedEntry(models.Model):
+    """
+    Модель ленты подписок.
+
+    Строка ленты пользователя user с рецептом автора, на которого
+    он подписан. Поля author и pub_date дублируют поля рецепта,
+    чтобы лента читалась одним проходом по индексу.
+    """
+
+    user = models.ForeignKey(User,
+                             verbose_name='Пользователь',
+                             on_delete=models.CASCADE,
+                             related_name='feed')
+    recipe = models.ForeignKey(Recipe,
+                               verbose_name='Рецепт',
+                               on_delete=models.CASCADE,
+                               related_name='feed_entries')
+    author = models.ForeignKey(User,
+                               verbose_name='Автор',
+                               on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        """Meta модели FeedEntry."""
+
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(fields=['user', 'recipe'],
+                                               name='unique_feed_entry')]
+        indexes = [models.Index(fields=['user', '-pub_date', '-recipe'],
+                                name='feed_user_pub_date_idx'),
+                   models.Index(fields=['user', 'author'],
+                                name='feed_user_author_idx')]
+
+    def __str__(self) -> str:
+        """Функция __str__ модели FeedEntry."""
+        return f'{self.recipe_id} в ленте пользователя {self.user_id}'
@@ -0,0 +1,111 @@
+"""
+Полнотекстовый поиск рецептов.
+
+На PostgreSQL индекс хранится в колонке search_vector (tsvector)
+таблицы рецептов с GIN индексом, на SQLite - в FTS5 таблице
+recipes_recipe_fts. Индекс строится по названию, описанию
+и названиям ингредиентов рецепта.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+WORD_RE = re.compile(r'\w+')
+
+PG_UPDATE_SQL = f'''
+    UPDATE recipes_recipe AS r SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', r.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM recipes_recipeingredient AS ri
+            JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = r.id), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', r.text), 'C')
+    WHERE r.id = ANY(%s)
+'''
+PG_MATCH_SQL = (
+    f"recipes_recipe.search_vector @@ plainto_tsquery('{SEARCH_CONFIG}', %s)")
+PG_RANK_SQL = (
+    f"ts_rank(recipes_recipe.search_vector, "
+    f"plainto_tsquery('{SEARCH_CONFIG}', %s))")
+
+SQLITE_DELETE_SQL = f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({{}})'
+SQLITE_INSERT_SQL = f'''
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT r.id, r.name, coalesce((
+        SELECT group_concat(i.name, ' ')
+        FROM recipes_recipeingredient AS ri
+        JOIN recipes_ingredient AS i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = r.id), ''), r.text
+    FROM recipes_recipe AS r WHERE r.id IN ({{}})
+'''
+SQLITE_MATCH_SQL = (
+    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s')
+SQLITE_RANK_SQL = (
+    f'SELECT -bm25({FTS_TABLE}, 10.0, 4.0, 1.0) FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id')
+
+
+def update_search_index(recipe_ids):
+    """Обновление поискового индекса для рецептов с recipe_ids."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(PG_UPDATE_SQL, [recipe_ids])
+        elif connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                SQLITE_DELETE_SQL.format(placeholders), recipe_ids)
+            cursor.execute(
+                SQLITE_INSERT_SQL.format(placeholders), recipe_ids)
+
+
+def delete_from_search_index(recipe_ids):
+    """Удаление рецептов из FTS5 таблицы SQLite."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or connection.vendor != 'sqlite':
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(SQLITE_DELETE_SQL.format(placeholders), recipe_ids)
+
+
+def get_fts_query(query):
+    """Безопасный запрос FTS5: слова в кавычках с поиском по префиксу."""
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def search_recipes(queryset, query):
+    """
+    Фильтрация рецептов по поисковому запросу.
+
+    Рецепты аннотируются релевантностью search_rank
+    и сортируются по ней.
+    """
+    if connection.vendor == 'postgresql':
+        queryset = queryset.annotate(
+            search_match=RawSQL(PG_MATCH_SQL, (query,),
+                                output_field=BooleanField()),
+            search_rank=RawSQL(PG_RANK_SQL, (query,),
+                               output_field=FloatField()),
+        ).filter(search_match=True)
+    elif connection.vendor == 'sqlite':
+        fts_query = get_fts_query(query)
+        if not fts_query:
+            return queryset.none()
+        queryset = queryset.filter(
+            pk__in=RawSQL(SQLITE_MATCH_SQL, (fts_query,))
+        ).annotate(
+            search_rank=RawSQL(SQLITE_RANK_SQL, (fts_query,),
+                               output_field=FloatField()),
+        )
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query))
+    return queryset.order_by('-search_rank', '-pub_date')
@@ -0,0 +1,99 @@
+"""
+Списки покупок пользователей.
+
+ShoppingListItem хранит суммы ингредиентов рецептов корзины.
+Добавление и удаление рецепта из корзины изменяет суммы на
+количества ингредиентов рецепта, а изменение ингредиентов рецепта
+в корзине пересобирает списки его владельцев.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from users.models import User
+
+from .models import Cart, RecipeIngredient, ShoppingListItem
+from .utils import batched
+
+
+def get_recipe_amounts(recipe_ids):
+    """Суммы ингредиентов рецептов recipe_ids."""
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).values_list('ingredient_id', 'total'))
+
+
+def apply_amounts(user_id, amounts, sign=1):
+    """
+    Изменение списка покупок пользователя на amounts.
+
+    sign=1 добавляет количества, sign=-1 вычитает их.
+    Строки с нулевым количеством удаляются.
+    """
+    if not amounts:
+        return
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            pk=user_id).values_list('pk'))
+        items = {item.ingredient_id: item
+                 for item in ShoppingListItem.objects.filter(
+                     user_id=user_id, ingredient_id__in=amounts)}
+        created, changed, removed = [], [], []
+        for ingredient_id, amount in amounts.items():
+            item = items.get(ingredient_id)
+            total = (item.amount if item else 0) + sign * amount
+            if item is None:
+                if total > 0:
+                    created.append(ShoppingListItem(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=total))
+            elif total > 0:
+                item.amount = total
+                changed.append(item)
+            else:
+                removed.append(item.pk)
+        ShoppingListItem.objects.bulk_create(created)
+        ShoppingListItem.objects.bulk_update(changed, ['amount'])
+        ShoppingListItem.objects.filter(pk__in=removed).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    """Добавление ингредиентов рецептов в список покупок."""
+    apply_amounts(user_id, get_recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Удаление ингредиентов рецептов из списка покупок."""
+    apply_amounts(user_id, get_recipe_amounts(recipe_ids), sign=-1)
+
+
+def rebuild_shopping_lists(user_ids):
+    """Пересборка списков покупок пользователей по их корзинам."""
+    for batch in batched(user_ids):
+        totals = defaultdict(dict)
+        rows = RecipeIngredient.objects.filter(
+            recipe__cart_recipe__user_id__in=batch
+        ).values(
+            'recipe__cart_recipe__user_id', 'ingredient_id'
+        ).annotate(total=Sum('amount')).order_by()
+        for row in rows:
+            totals[row['recipe__cart_recipe__user_id']][
+                row['ingredient_id']] = row['total']
+        with transaction.atomic():
+            ShoppingListItem.objects.filter(user_id__in=batch).delete()
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                                 amount=amount)
+                for user_id, amounts in totals.items()
+                for ingredient_id, amount in amounts.items()
+            ], batch_size=1000)
+
+
+def refresh_recipes(recipe_ids):
+    """Пересборка списков покупок пользователей с рецептами в корзине."""
+    rebuild_shopping_lists(Cart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True).order_by().distinct())
@@ -0,0 +1,226 @@
+"""Write your recipes app signals here."""
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import Follow, User
+
+from .catalog import (INGREDIENTS_CATALOG, RECIPES_CATALOG, TAGS_CATALOG,
+                      bump_catalog_version)
+from .changes import log_recipe_changes, recipe_ingredients_changed
+from .counters import change_counter
+from .feed import (add_author_to_feed, remove_author_from_feed,
+                   schedule_fan_out)
+from .images import (delete_derivatives, needs_processing,
+                     schedule_recipe_image)
+from .membership import carts, favorites
+from .models import (Cart, Favorite, Ingredient, Recipe, RecipeIngredient,
+                     SimilarRecipe, Tag)
+from .search import delete_from_search_index, update_search_index
+from .shopping_list import add_recipes, remove_recipes
+
+# Поля автора в ответе списка рецептов.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Смена версии справочника ингредиентов."""
+    bump_catalog_version(INGREDIENTS_CATALOG)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Смена версии справочника тэгов."""
+    bump_catalog_version(TAGS_CATALOG)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Обновление поискового индекса рецептов с ингредиентом."""
+    if not created:
+        update_search_index(RecipeIngredient.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    """
+    Обновление рецептов с удаляемым ингредиентом.
+
+    Рецепты обновляются один раз после коммита удаления,
+    строки RecipeIngredient удаляются каскадом без сигналов.
+    """
+    recipe_ids = list(RecipeIngredient.objects.filter(
+        ingredient=instance).values_list('recipe_id', flat=True))
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: recipe_ingredients_changed(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Обновление поискового индекса рецепта."""
+    update_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    """Обработка новой картинки рецепта после коммита транзакции."""
+    if needs_processing(instance):
+        recipe_id, image_name = instance.pk, instance.image.name
+        transaction.on_commit(
+            lambda: schedule_recipe_image(recipe_id, image_name))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted_images(sender, instance, **kwargs):
+    """Удаление производных картинки после удаления рецепта."""
+    derivatives = instance.image_derivatives
+    transaction.on_commit(lambda: delete_derivatives(derivatives))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Запись изменения рецепта в журнал."""
+    log_recipe_changes([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_list_changed(sender, instance, created=True, **kwargs):
+    """Смена версии списков рецептов при добавлении и удалении."""
+    if created:
+        bump_catalog_version(RECIPES_CATALOG)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Увеличение версии рецептов при изменении тэгов."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.objects.filter(pk=instance.pk).touch()
+    elif action == 'pre_clear':
+        Recipe.objects.filter(tags=instance).touch()
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.filter(pk__in=pk_set).touch()
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """
+    Пересчет похожих рецептов, в списках которых есть удаляемый.
+
+    Строки SimilarRecipe удаляются каскадом, поэтому владельцы
+    списков помечаются до удаления.
+    """
+    Recipe.objects.filter(pk__in=SimilarRecipe.objects.filter(
+        similar=instance).values('recipe_id')).update(similar_stale=True)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Удаление рецепта из поискового индекса."""
+    delete_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created_count(sender, instance, created, **kwargs):
+    """Увеличение счетчика рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created_feed(sender, instance, created, **kwargs):
+    """Добавление нового рецепта в ленты подписчиков после коммита."""
+    if created:
+        recipe_id, author_id = instance.pk, instance.author_id
+        pub_date = instance.pub_date
+        transaction.on_commit(
+            lambda: schedule_fan_out(recipe_id, author_id, pub_date))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted_count(sender, instance, **kwargs):
+    """Уменьшение счетчика рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_saved(sender, instance, created, **kwargs):
+    """Сброс кэша избранного пользователя и счетчик рецепта."""
+    if created:
+        favorites.invalidate(instance.user_id)
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    """Сброс кэша избранного пользователя и счетчик рецепта."""
+    favorites.invalidate(instance.user_id)
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Cart)
+def cart_saved(sender, instance, created, **kwargs):
+    """Сброс кэша корзины пользователя, счетчик и список покупок."""
+    if created:
+        carts.invalidate(instance.user_id)
+        change_counter(Recipe, instance.recipe_id, 'carts_count', 1)
+        add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_deleting(sender, instance, **kwargs):
+    """
+    Вычитание ингредиентов рецепта из списка покупок.
+
+    Выполняется до удаления, пока ингредиенты рецепта
+    еще есть в базе и при каскадном удалении рецепта.
+    """
+    remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    """Сброс кэша корзины пользователя и счетчик рецепта."""
+    carts.invalidate(instance.user_id)
+    change_counter(Recipe, instance.recipe_id, 'carts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Счетчик подписчиков автора и рецепты автора в ленте."""
+    if created:
+        change_counter(User, instance.following_id, 'followers_count', 1)
+        add_author_to_feed(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Счетчик подписчиков автора и удаление автора из ленты."""
+    change_counter(User, instance.following_id, 'followers_count', -1)
+    remove_author_from_feed(instance.user_id, instance.following_id)
+
+
+@receiver(pre_save, sender=User)
+def author_saving(sender, instance, update_fields, **kwargs):
+    """Запоминание полей автора до сохранения профиля."""
+    instance._author_fields = None
+    if instance._state.adding or (
+            update_fields is not None
+            and update_fields.isdisjoint(AUTHOR_FIELDS)):
+        return
+    instance._author_fields = User.objects.filter(
+        pk=instance.pk).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, **kwargs):
+    """Увеличение версии рецептов автора при изменении его полей."""
+    old_fields = getattr(instance, '_author_fields', None)
+    if created or old_fields is None:
+        return
+    if old_fields != tuple(getattr(instance, name) for name in AUTHOR_FIELDS):
+        Recipe.objects.filter(author=instance).touch()
@@ -0,0 +1,138 @@
+"""
+Похожие рецепты.
+
+Сходство рецептов считается как коэффициент Жаккара по множествам
+ингредиентов плюс коэффициент Жаккара по тэгам с весом
+SIMILAR_RECIPES_TAG_WEIGHT. Матрица рецепт × ингредиент хранится
+разреженно: множества ингредиентов рецептов и обратный индекс
+ингредиент → рецепты. Пересечения рецепта со всеми остальными
+считаются одним проходом по спискам его ингредиентов, поэтому
+сравниваются только рецепты с общими ингредиентами.
+
+Лучшие SIMILAR_RECIPES_COUNT рецептов записываются в SimilarRecipe,
+эндпоинт похожих рецептов только читает эту таблицу.
+"""
+import heapq
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+from .utils import batched
+
+
+class SimilarityIndex:
+    """Разреженная матрица рецептов по ингредиентам и тэгам."""
+
+    def __init__(self, ingredients, tags):
+        """Построение обратного индекса ингредиент → рецепты."""
+        self.ingredients = ingredients
+        self.tags = tags
+        self.postings = defaultdict(list)
+        for recipe_id, recipe_ingredients in ingredients.items():
+            for ingredient_id in recipe_ingredients:
+                self.postings[ingredient_id].append(recipe_id)
+
+    @classmethod
+    def build(cls):
+        """Загрузка ингредиентов и тэгов всех рецептов."""
+        ingredients, tags = defaultdict(set), defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id').iterator():
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id').iterator():
+            tags[recipe_id].add(tag_id)
+        return cls(ingredients, tags)
+
+    def scores(self, recipe_id):
+        """Оценки сходства рецепта с рецептами с общими ингредиентами."""
+        ingredients = self.ingredients.get(recipe_id, ())
+        overlap = Counter()
+        for ingredient_id in ingredients:
+            overlap.update(self.postings[ingredient_id])
+        overlap.pop(recipe_id, None)
+        tags = self.tags.get(recipe_id)
+        weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        result = {}
+        for other_id, common in overlap.items():
+            score = common / (
+                len(ingredients) + len(self.ingredients[other_id]) - common)
+            other_tags = self.tags.get(other_id)
+            if tags and other_tags:
+                score += weight * (
+                    len(tags & other_tags) / len(tags | other_tags))
+            result[other_id] = round(score, 6)
+        return result
+
+    def neighbours(self, recipe_id, count):
+        """Лучшие count похожих рецептов в порядке убывания оценки."""
+        return heapq.nlargest(
+            count, self.scores(recipe_id).items(), key=itemgetter(1, 0))
+
+
+def write_neighbours(index, recipe_ids, count):
+    """Запись похожих рецептов для recipe_ids пачками."""
+    for batch in batched(recipe_ids):
+        rows = [
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for recipe_id in batch
+            for similar_id, score in index.neighbours(recipe_id, count)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(rows, batch_size=1000)
+
+
+def get_affected(index, changed_ids, count):
+    """
+    Рецепты, списки которых меняются из-за измененных рецептов.
+
+    Это рецепты, в списках которых уже есть измененный рецепт,
+    и рецепты, в список которых измененный рецепт теперь попадает.
+    """
+    affected = set()
+    for batch in batched(changed_ids):
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=batch).values_list('recipe_id', flat=True))
+    thresholds = {
+        row['recipe_id']: (row['total'], row['lowest'])
+        for row in SimilarRecipe.objects.values('recipe_id').annotate(
+            total=Count('id'), lowest=Min('score')).order_by()
+    }
+    for recipe_id in changed_ids:
+        for other_id, score in index.scores(recipe_id).items():
+            total, lowest = thresholds.get(other_id, (0, 0))
+            if total < count or score > lowest:
+                affected.add(other_id)
+    return affected
+
+
+def update_similar_recipes(full=False):
+    """
+    Пересчет похожих рецептов.
+
+    По умолчанию пересчитываются рецепты, измененные с прошлого
+    запуска (similar_stale), и рецепты, на списки которых они влияют.
+    Флаг снимается до расчета, поэтому рецепт, измененный во время
+    расчета, попадет в следующий запуск.
+    """
+    recipes = Recipe.objects.all()
+    if not full:
+        recipes = recipes.filter(similar_stale=True)
+    changed_ids = list(recipes.values_list('pk', flat=True))
+    if not changed_ids:
+        return 0
+    for batch in batched(changed_ids):
+        Recipe.objects.filter(pk__in=batch).update(similar_stale=False)
+    count = settings.SIMILAR_RECIPES_COUNT
+    index = SimilarityIndex.build()
+    affected = set(changed_ids)
+    if not full:
+        affected.update(get_affected(index, changed_ids, count))
+    write_neighbours(index, sorted(affected), count)
+    return len(affected)
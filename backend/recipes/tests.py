@@ -0,0 +1,249 @@
+"""Тесты приложения recipes."""
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from users.models import Follow, User
+
+from .feed import fan_out_recipe
+from .images import render_derivatives
+from .models import (FeedEntry, Ingredient, Recipe, RecipeIngredient,
+                     SimilarRecipe, Tag)
+from .similarity import update_similar_recipes
+
+
+@override_settings(SIMILAR_RECIPES_COUNT=2)
+class SimilarRecipeDeleteTest(TestCase):
+    """Похожие рецепты после удаления рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с общими ингредиентами и посчитанные списки."""
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='г')
+        cls.recipes = []
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1)
+            cls.recipes.append(recipe)
+        update_similar_recipes(full=True)
+
+    def test_delete_marks_lists_stale(self):
+        """Рецепты со списком, где был удаленный рецепт, пересчитываются."""
+        deleted = self.recipes[-1]
+        owners = set(SimilarRecipe.objects.filter(
+            similar=deleted).values_list('recipe_id', flat=True))
+        self.assertTrue(owners)
+        deleted.delete()
+        self.assertEqual(
+            set(Recipe.objects.filter(similar_stale=True).values_list(
+                'pk', flat=True)),
+            owners)
+        update_similar_recipes()
+        for recipe in self.recipes[:-1]:
+            self.assertEqual(
+                SimilarRecipe.objects.filter(recipe=recipe).count(), 2)
+
+
+class RecipeSaveTest(TestCase):
+    """Сохранение рецепта и профиля автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор и рецепт с готовыми копиями картинки."""
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='recipe', text='text',
+            image='recipes/image.png', cooking_time=10,
+            image_derivatives={'source': 'recipes/image.png'})
+
+    def get_version(self):
+        """Версия рецепта в базе данных."""
+        return Recipe.objects.values_list('version', flat=True).get(
+            pk=self.recipe.pk)
+
+    def test_save_keeps_background_fields(self):
+        """save() не перезаписывает поля фоновых задач."""
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        derivatives = {'source': 'recipes/image.png', 'thumb': 'thumb.webp'}
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_derivatives=derivatives, similar_stale=False)
+        recipe.name = 'renamed'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'renamed')
+        self.assertEqual(recipe.image_derivatives, derivatives)
+        self.assertFalse(recipe.similar_stale)
+
+    def test_author_save_touches_on_rendered_fields(self):
+        """Версия рецептов меняется только при смене полей автора."""
+        version = self.get_version()
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('NewPassw0rd!')
+        author.save()
+        self.assertEqual(self.get_version(), version)
+        author.first_name = 'renamed'
+        author.save()
+        self.assertEqual(self.get_version(), version + 1)
+
+
+@override_settings(SIMILAR_RECIPES_TAG_WEIGHT=0.25)
+class SimilarRecipeScoreTest(TestCase):
+    """Оценки сходства рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Рецепты с пересекающимися ингредиентами и тэгами."""
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        ingredients = [Ingredient.objects.create(
+            name=f'ingredient{i}', measurement_unit='г') for i in range(3)]
+        tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.recipes = []
+        for i, (indexes, tagged) in enumerate(
+                (((0, 1), True), ((0, 1, 2), True), ((2,), False))):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe{i}', text='text',
+                image='recipes/image.png', cooking_time=10)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredients[index])
+                for index in indexes)
+            if tagged:
+                recipe.tags.add(tag)
+            cls.recipes.append(recipe)
+
+    def test_scores(self):
+        """Жаккар по ингредиентам плюс взвешенный Жаккар по тэгам."""
+        self.assertEqual(update_similar_recipes(full=True), 3)
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.assertEqual(
+            set(SimilarRecipe.objects.values_list(
+                'recipe_id', 'similar_id', 'score')),
+            {(first, second, round(2 / 3 + 0.25, 6)),
+             (second, first, round(2 / 3 + 0.25, 6)),
+             (second, third, round(1 / 3, 6)),
+             (third, second, round(1 / 3, 6))})
+        self.assertFalse(Recipe.objects.filter(similar_stale=True).exists())
+
+
+@override_settings(FEED_MAX_LENGTH=2)
+class FeedFanOutTest(TestCase):
+    """Рассылка новых рецептов в ленты подписчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Автор и два подписчика."""
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        cls.followers = [User.objects.create_user(
+            username=f'follower{i}', email=f'follower{i}@foodgram.ru',
+            first_name='follower', last_name='follower', password='Passw0rd!')
+            for i in range(2)]
+        for follower in cls.followers:
+            Follow.objects.create(user=follower, following=cls.author)
+
+    def create_recipe(self, name):
+        """Рецепт автора без рассылки в ленты."""
+        with mock.patch('recipes.signals.schedule_fan_out'):
+            return Recipe.objects.create(
+                author=self.author, name=name, text='text',
+                image='recipes/image.png', cooking_time=10,
+                image_derivatives={'source': 'recipes/image.png'})
+
+    def test_fan_out_scheduled_after_commit(self):
+        """Рассылка ставится в очередь только после коммита."""
+        with mock.patch('recipes.signals.schedule_fan_out') as schedule:
+            with self.captureOnCommitCallbacks() as callbacks:
+                recipe = Recipe.objects.create(
+                    author=self.author, name='recipe', text='text',
+                    image='recipes/image.png', cooking_time=10,
+                    image_derivatives={'source': 'recipes/image.png'})
+            schedule.assert_not_called()
+            for callback in callbacks:
+                callback()
+        schedule.assert_called_once_with(
+            recipe.pk, self.author.pk, recipe.pub_date)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+
+    def test_fan_out_trims_feeds(self):
+        """В лентах остаются FEED_MAX_LENGTH последних рецептов."""
+        recipes = [self.create_recipe(f'recipe{i}') for i in range(3)]
+        for recipe in recipes:
+            fan_out_recipe(recipe.pk, recipe.author_id, recipe.pub_date)
+        for follower in self.followers:
+            self.assertEqual(
+                list(FeedEntry.objects.filter(user=follower).values_list(
+                    'recipe_id', flat=True)),
+                [recipes[2].pk, recipes[1].pk])
+
+    def test_fan_out_of_deleted_recipe(self):
+        """Рецепт, удаленный до рассылки, в ленты не попадает."""
+        recipe = self.create_recipe('recipe')
+        recipe_id, pub_date = recipe.pk, recipe.pub_date
+        recipe.delete()
+        fan_out_recipe(recipe_id, self.author.pk, pub_date)
+        self.assertFalse(FeedEntry.objects.exists())
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT,
+                   RECIPE_IMAGE_SIZES={'small': 32, 'large': 128})
+class RecipeImageTest(TestCase):
+    """Производные изображения рецептов."""
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной папки media."""
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_render_derivatives(self):
+        """Копии уменьшаются до ширины размера и не увеличиваются."""
+        source = BytesIO()
+        Image.new('RGBA', (100, 50), (255, 0, 0, 128)).save(source, 'PNG')
+        source.seek(0)
+        sizes = {}
+        for size, extension, content in render_derivatives(source):
+            with Image.open(BytesIO(content)) as image:
+                sizes[size, extension] = image.size
+        self.assertEqual(sizes, {
+            ('small', 'webp'): (32, 16), ('small', 'jpeg'): (32, 16),
+            ('large', 'webp'): (100, 50), ('large', 'jpeg'): (100, 50)})
+
+    def test_delete_removes_derivatives(self):
+        """Файлы производных удаляются после удаления рецепта."""
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='author', last_name='author', password='Passw0rd!')
+        paths = [default_storage.save(
+            f'recipes/derivatives/image_small.{extension}',
+            ContentFile(b'image')) for extension in ('webp', 'jpeg')]
+        recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text',
+            image='recipes/image.png', cooking_time=10,
+            image_derivatives={'source': 'recipes/image.png', 'sizes': {
+                'small': dict(zip(('webp', 'jpeg'), paths))}})
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe.delete()
+        self.assertTrue(all(map(default_storage.exists, paths)))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(any(map(default_storage.exists, paths)))
@@ -0,0 +1,13 @@
+"""Write your recipes app utils here."""
+from itertools import islice
+
+BATCH_SIZE = 1000
+
+
+def batched(iterable, size=BATCH_SIZE):
+    """Генератор списков по size элементов."""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
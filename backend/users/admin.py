@@ -12,9 +12,12 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'email',
+        'recipes_count',
+        'followers_count',
     )
     search_fields = ('username', 'email', 'last_name')
     list_filter = ('username', 'email', 'first_name')
+    readonly_fields = ('recipes_count', 'followers_count')
     empty_value_display = '-пусто-'
 
 
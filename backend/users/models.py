@@ -4,7 +4,34 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Модель со счетчиками, которые обновляются через F() выражения.
+
+    При сохранении существующего объекта счетчики из counter_fields
+    и поля background_fields, которые пишут фоновые задачи через
+    update(), не перезаписываются устаревшими значениями экземпляра.
+    Отложенные поля, как и в Model.save(), не сохраняются.
+    """
+
+    counter_fields = ()
+    background_fields = ()
+
+    def save(self, *args, **kwargs):
+        """Сохранение всех полей, кроме счетчиков и фоновых полей."""
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+                and field.name not in self.background_fields]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Кастомная модель пользователя."""
 
     username = models.CharField(
@@ -30,6 +57,18 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         """Meta модели CustomUser."""
@@ -5,7 +5,10 @@ from djoser.serializers import (UserCreateSerializer,
                                 UserSerializer, PasswordSerializer)
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from api.fields import ImageDerivativesField
+from api.sparse_fields import SparseFieldsMixin
 from .models import Follow
+from .utils import get_recipes_limit
 from recipes.models import Recipe
 
 User = get_user_model()
@@ -27,6 +30,8 @@ class UserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Метод для получения свойства is_subscribed."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return (self.context.get('request').user.is_authenticated
                 and Follow.objects.filter(
                     user=self.context.get('request').user,
@@ -74,15 +79,16 @@ class FollowRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер для кратких рецептов в подписках."""
 
     image = Base64ImageField()
+    images = ImageDerivativesField()
 
     class Meta:
         """Meta настройки сериалайзера кратких рецептов."""
 
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериалайзер для модели Follow."""
 
     id = serializers.IntegerField(source='following.id', read_only=True)
@@ -95,7 +101,8 @@ class FollowSerializer(serializers.ModelSerializer):
                                       read_only=True)
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='following.recipes.count')
+    recipes_count = serializers.IntegerField(source='following.recipes_count',
+                                             read_only=True)
 
     class Meta:
         """Meta настройки сериалайзера модели Follow."""
@@ -105,15 +112,23 @@ class FollowSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        """Метод для получения свойства is_subscribed."""
-        return Follow.objects.filter(
-            user=self.context.get('request').user,
-            following=obj.following
-        ).exists()
+        """
+        Метод для получения свойства is_subscribed.
+
+        Сериалайзер отдает подписки текущего пользователя,
+        поэтому свойство всегда истинно.
+        """
+        return True
 
     def get_recipes(self, obj):
         """Метод для получения рецептов."""
-        recipes = obj.following.recipe.all()
+        if hasattr(obj.following, 'limited_recipes'):
+            recipes = obj.following.limited_recipes
+        else:
+            recipes = obj.following.recipe.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return FollowRecipeSerializer(
             recipes,
             many=True).data
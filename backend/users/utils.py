@@ -0,0 +1,14 @@
+"""Write your users app utils here."""
+
+RECIPES_LIMIT_PARAM = 'recipes_limit'
+
+
+def get_recipes_limit(request):
+    """Получение параметра recipes_limit из запроса."""
+    if request is None:
+        return None
+    try:
+        recipes_limit = int(request.query_params[RECIPES_LIMIT_PARAM])
+    except (KeyError, ValueError):
+        return None
+    return max(recipes_limit, 0)
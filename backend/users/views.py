@@ -1,4 +1,5 @@
 """Set your users Views here."""
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,20 +10,26 @@ from rest_framework.permissions import (IsAuthenticated,)
 from .serializers import (UserSerializer, UserCreateSerializer,
                           FollowSerializer, SetPasswordSerializer)
 from .models import Follow
+from .utils import get_recipes_limit
+from recipes.models import Recipe
+from api.metrics import timed_serializer
+from api.mixins import SerializerTimingMixin
+from api.sparse_fields import get_sparse_fields
 from rest_framework.status import (HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 
 User = get_user_model()
 
 
-class CreateDestroyViewSet(mixins.CreateModelMixin,
+class CreateDestroyViewSet(SerializerTimingMixin,
+                           mixins.CreateModelMixin,
                            mixins.DestroyModelMixin,
                            viewsets.GenericViewSet):
     """Mixin CreateDestroy."""
     pass
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(SerializerTimingMixin, UserViewSet):
     """Viewset для модели CustomUser и UserSerializer."""
 
     queryset = User.objects.all()
@@ -42,6 +49,32 @@ class UserViewSet(UserViewSet):
             self.permission_classes = [IsAuthenticated, ]
         return super().get_permissions()
 
+    def get_subscriptions_queryset(self, user):
+        """
+        Подписки пользователя с авторами.
+
+        Рецепты авторов подгружаются одним запросом, не более
+        recipes_limit последних рецептов на автора, и только
+        если поле recipes есть в ответе. Последние рецепты автора
+        читаются по индексу recipe_author_pub_date_idx без сортировки.
+        """
+        queryset = Follow.objects.filter(user=user).select_related(
+            'following').order_by('id')
+        fields = get_sparse_fields(self.request, FollowSerializer)
+        if fields is not None and 'recipes' not in fields:
+            return queryset
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('pk')[:recipes_limit]))
+        return queryset.prefetch_related(
+            Prefetch('following__recipe', queryset=recipes,
+                     to_attr='limited_recipes')
+        )
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated],
@@ -49,14 +82,13 @@ class UserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         """Метод для получения списка подписчиков."""
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = self.get_subscriptions_queryset(request.user)
         pages = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(
+        serializer = timed_serializer(FollowSerializer(
             pages,
             many=True,
             context={'request': request}
-        )
+        ))
         return self.get_paginated_response(serializer.data)
 
 